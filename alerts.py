@@ -0,0 +1,219 @@
+"""
+声明式告警规则引擎
+
+规则写法 (字典，可放在 alert_rules.json 覆盖默认规则):
+    {"name": "dist_warn", "when": "dist < 40 and st != 3", "hyst": 3,
+     "for": 0, "level": "warn", "msg": "接近障碍"}
+
+  when  : 若干 "通道 运算符 数值" 子句以 and 连接，运算符 < <= > >= == !=
+          子句末尾可写 "~带宽" 单独指定该子句的迟滞，如 "dist < 40 ~5"；空格可省略 ("dist<40")
+  hyst  : 迟滞带宽；触发后阈值向释放方向放宽 hyst 才解除。只作用于没有单独指定 ~ 的阈值子句 (< <= > >=)，
+          "dist > 0" / "dist >= 1" / "dist != 0" 这类排除 0 读数 (无回波) 的有效性子句永不放宽
+  for   : 持续条件 (秒)；条件连续满足这么久才真正触发
+  level : info / warn / danger，决定 UI 颜色及是否写日志
+  log   : 是否写入黑匣子日志与会话事件 (默认 warn/danger 写)
+
+可用通道: st dr sp sta dat (原始字段), dist (非停靠状态下的距离，停靠时保持上一值),
+          d_dist (距离变化率 cm/s，负值表示正在接近)
+
+编译方式: 每个子句先编译成谓词闭包，再在各通道有限取值域 (字段 0..255，变化率取整并限幅)
+上展开成查表数组，表项是"满足该通道全部子句的规则位掩码"。每帧只需对每个通道查一次表并按位与，
+开销与规则条数无关；只有状态发生变化的位才进入迟滞/持续计时处理。
+"""
+import os
+import re
+import json
+import operator
+
+from telemetry import ST_STATION
+
+RATE_CLAMP = 1000   # d_dist 取值域 [-1000, 1000] cm/s
+RATE_ALPHA = 0.3    # 变化率一阶平滑系数
+
+CHANNELS = ("st", "dr", "sp", "sta", "dat", "dist", "d_dist")
+_DOMAIN = {"d_dist": range(-RATE_CLAMP, RATE_CLAMP + 1)}
+_CLAUSE = re.compile(r"\s*(\w+)\s*(<=|>=|==|!=|<|>)\s*(-?\d+(?:\.\d+)?)\s*(?:~\s*(\d+(?:\.\d+)?))?\s*$")
+_AND = re.compile(r"\s+and\s+")
+LEVELS = ("info", "warn", "danger")
+_OPS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+        "==": operator.eq, "!=": operator.ne}
+
+DEFAULT_RULES = [
+    {"name": "dist_caution", "when": "dist > 0 and dist < 60 and st != 3", "hyst": 3, "level": "info", "msg": "注意观察"},
+    {"name": "dist_warn",    "when": "dist > 0 and dist < 40 and st != 3", "hyst": 3, "level": "warn", "msg": "接近障碍"},
+    {"name": "dist_danger",  "when": "dist > 0 and dist < 20 and st != 3", "hyst": 3, "level": "danger", "msg": "碰撞警告"},
+    {"name": "aeb",          "when": "st == 2", "level": "danger", "msg": "主动刹车介入"},
+    {"name": "aeb_stuck",    "when": "st == 2", "for": 3.0, "level": "danger", "msg": "AEB 持续超过 3 秒，前方可能被阻塞"},
+    {"name": "fast_closing", "when": "d_dist < -150 and st == 1", "for": 0.2, "level": "warn", "msg": "障碍物快速接近"},
+]
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alert_rules.json")
+
+
+def load_rules(path=RULES_FILE):
+    """ 有 alert_rules.json 时使用之，否则使用默认规则；文件内容不合法时抛 ValueError """
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            rules = json.load(f)
+        check_rules(rules)
+        return rules
+    return DEFAULT_RULES
+
+
+def check_rules(rules):
+    """ 检查规则列表的结构与每个子句，任何问题都抛 ValueError (指明第几条规则) """
+    if not isinstance(rules, list):
+        raise ValueError("告警规则应为列表")
+    seen = set()
+    for i, r in enumerate(rules, 1):
+        if not isinstance(r, dict):
+            raise ValueError(f"第 {i} 条告警规则不是对象")
+        name, when = r.get("name"), r.get("when")
+        if not isinstance(name, str) or not name:
+            raise ValueError(f"第 {i} 条告警规则缺少 name")
+        if name in seen:
+            raise ValueError(f"告警规则重名: {name}")
+        seen.add(name)
+        if not isinstance(when, str) or not when.strip():
+            raise ValueError(f"告警规则 {name} 缺少 when")
+        if r.get("level", "warn") not in LEVELS:
+            raise ValueError(f"告警规则 {name} 的 level 应为 {'/'.join(LEVELS)}")
+        for key in ("hyst", "for"):
+            v = r.get(key, 0)
+            if isinstance(v, bool) or not isinstance(v, (int, float)) or v < 0:
+                raise ValueError(f"告警规则 {name} 的 {key} 应为非负数")
+        for clause in _AND.split(when.strip()):
+            _compile_clause(clause, 0)
+
+
+def _is_guard(op, val):
+    """ 排除 0 读数的有效性子句：> 0、>= 1、!= 0 """
+    return (op is operator.gt and val == 0) or (op is operator.ge and val == 1) or (op is operator.ne and val == 0)
+
+
+def _compile_clause(text, hyst):
+    """ "dist < 40" / "dist<40" / "dist < 40 ~5" -> (通道, 触发谓词, 保持谓词) """
+    m = _CLAUSE.match(text)
+    if not m or m.group(1) not in CHANNELS:
+        raise ValueError(f"无法解析的告警条件: {text!r}")
+    ch, op, val = m.group(1), _OPS[m.group(2)], float(m.group(3))
+    if m.group(4) is not None: hyst = float(m.group(4))
+    elif _is_guard(op, val): hyst = 0
+    if op in (operator.lt, operator.le): relaxed = val + hyst
+    elif op in (operator.gt, operator.ge): relaxed = val - hyst
+    else: relaxed = val
+    return ch, (lambda v: op(v, val)), (lambda v: op(v, relaxed))
+
+
+class AlertEngine:
+    """ [告警] 规则一次编译为按通道查表的位掩码，逐帧评估 """
+    def __init__(self, rules=None, on_event=None):
+        self.on_event = on_event   # 回调 (t, rule, active)
+        self.compile(DEFAULT_RULES if rules is None else rules)
+
+    def compile(self, rules):
+        check_rules(rules)
+        self.rules = [dict(r) for r in rules]
+        self.bits = {r["name"]: 1 << i for i, r in enumerate(self.rules)}
+        full = (1 << len(self.rules)) - 1
+        on_tabs, hold_tabs = {}, {}
+        self.delay = {}            # 位 -> 持续秒数
+        self.log_mask = 0
+        self.level_mask = {"info": 0, "warn": 0, "danger": 0}
+        for i, r in enumerate(self.rules):
+            bit = 1 << i
+            lv = r.get("level", "warn")
+            self.level_mask[lv] = self.level_mask.get(lv, 0) | bit
+            if r.get("log", lv != "info"): self.log_mask |= bit
+            if r.get("for", 0) > 0: self.delay[bit] = float(r["for"])
+            for clause in _AND.split(r["when"].strip()):
+                ch, on_p, hold_p = _compile_clause(clause, float(r.get("hyst", 0)))
+                dom = _DOMAIN.get(ch, range(256))
+                on_t = on_tabs.setdefault(ch, [full] * len(dom))
+                hold_t = hold_tabs.setdefault(ch, [full] * len(dom))
+                for k, v in enumerate(dom):
+                    if not on_p(v): on_t[k] &= ~bit
+                    if not hold_p(v): hold_t[k] &= ~bit
+        # 只保留规则实际引用的通道，按 CHANNELS 顺序排列为 (下标, 触发表, 保持表)
+        self.chans = tuple((CHANNELS.index(ch), tuple(on_tabs[ch]), tuple(hold_tabs[ch]))
+                           for ch in CHANNELS if ch in on_tabs)
+        self.full = full
+        self.reset()
+
+    def reset(self):
+        self.raw = 0        # 条件成立 (含迟滞)
+        self.active = 0     # 已触发 (含持续条件)
+        self.pending = {}   # 位 -> 触发时刻
+        self.next_due = None
+        self.dist = 0; self.rate = 0.0
+        self.t_dist = None; self.d_ref = 0   # 变化率参考样本 (时间戳严格更早的那一组的首帧)
+
+    def bit(self, name):
+        return self.bits.get(name, 0)
+
+    def evaluate(self, t, st, dr, sp, sta, dat):
+        """ 评估一帧，返回当前已触发的规则位掩码 (self.active) """
+        # 派生通道：距离与距离变化率
+        # 同一时间戳的多帧 (批量读取) 只更新距离，不挪动变化率参考样本，否则变化率会被算成一帧的位移 / 整个读取周期
+        if st != ST_STATION:
+            if self.t_dist is None or t > self.t_dist:
+                if self.t_dist is not None:
+                    r = (dat - self.d_ref) / (t - self.t_dist)
+                    self.rate += RATE_ALPHA * (r - self.rate)
+                self.d_ref = dat; self.t_dist = t
+            self.dist = dat
+        rate = int(self.rate)
+        if rate > RATE_CLAMP: rate = RATE_CLAMP
+        elif rate < -RATE_CLAMP: rate = -RATE_CLAMP
+        vals = (st, dr, sp, sta, dat, self.dist, rate + RATE_CLAMP)
+
+        on = hold = self.full
+        for idx, on_t, hold_t in self.chans:
+            v = vals[idx]
+            on &= on_t[v]; hold &= hold_t[v]
+        raw = on | (self.raw & hold)
+
+        changed = raw ^ self.raw
+        if changed:
+            self.raw = raw
+            self._edges(t, changed & raw, changed & ~raw)
+        if self.next_due is not None and t >= self.next_due:
+            self._mature(t)
+        return self.active
+
+    def _edges(self, t, rising, falling):
+        fire = 0
+        x = rising
+        while x:
+            b = x & -x; x ^= b
+            if b in self.delay:
+                due = t + self.delay[b]
+                self.pending[b] = due
+                if self.next_due is None or due < self.next_due: self.next_due = due
+            else:
+                fire |= b
+        x = falling
+        while x:
+            b = x & -x; x ^= b
+            if self.pending.pop(b, None) is not None:
+                self.next_due = min(self.pending.values()) if self.pending else None
+        if fire: self._set(t, fire, True)
+        cleared = falling & self.active
+        if cleared: self._set(t, cleared, False)
+
+    def _mature(self, t):
+        fire = 0
+        for b, due in list(self.pending.items()):
+            if due <= t:
+                fire |= b; del self.pending[b]
+        self.next_due = min(self.pending.values()) if self.pending else None
+        if fire: self._set(t, fire, True)
+
+    def _set(self, t, mask, on):
+        if on: self.active |= mask
+        else: self.active &= ~mask
+        ev = mask & self.log_mask
+        if ev and self.on_event:
+            while ev:
+                b = ev & -ev; ev ^= b
+                self.on_event(t, self.rules[b.bit_length() - 1], on)
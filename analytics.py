@@ -0,0 +1,256 @@
+"""
+圈速 / 站点增量统计引擎
+
+消费解码后的遥测帧流 (t, st, dr, sp, sta, dat)，每帧 O(1) 更新：
+  - 各站到站时刻、停靠时长 (st=3 倒计时期间)
+  - 站间区间用时、区间内 AEB (st=2) 触发次数、区间最近障距
+  - 圈速 (相邻两次抵达 1 号站)
+会话结束后写出按站点组织的索引 (.idx.json)，跨会话查询时无需重扫原始数据。
+
+用法: python analytics.py [sessions目录] [--station N] [--segment A-B]
+"""
+import os
+import json
+
+from telemetry import (ST_AEB, ST_STATION, STATIONS_PER_LAP, SESSION_DIR, SESSION_EXT,
+                       iter_session, list_sessions)
+
+INDEX_EXT = ".idx.json"
+STA_WRAP_GAP = 16   # 到站时 sta 比上次小且模 256 差值不超过该值，视为 8 位计数器回绕 (255 -> 0) 而非复位
+
+
+class RunningStat:
+    """ [分析] 常数内存的计数/均值/极值累加器 """
+    __slots__ = ("n", "total", "min", "max", "last")
+
+    def __init__(self):
+        self.n = 0; self.total = 0.0
+        self.min = None; self.max = None; self.last = None
+
+    def add(self, v):
+        self.n += 1; self.total += v; self.last = v
+        if self.min is None or v < self.min: self.min = v
+        if self.max is None or v > self.max: self.max = v
+
+    @property
+    def mean(self):
+        return self.total / self.n if self.n else None
+
+
+class LapAnalytics:
+    """ [分析] 增量圈速/站点统计引擎 (每帧 O(1)) """
+    def __init__(self, stations_per_lap=STATIONS_PER_LAP):
+        self.n_sta = stations_per_lap
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.t_last = None
+        self.aeb_total = 0
+        self.prev_st = -1
+        self.last_sta = -1; self.sta_abs = 0   # 上次到站的原始计数器 / 展开回绕后的累计值
+        # 当前停靠
+        self.cur_station = None; self.t_arrive = 0.0; self.dwell_cmd = 0
+        # 当前区间 (seg_from=0 表示发车点)
+        self.seg_from = 0; self.seg_t0 = None; self.seg_aeb = 0; self.seg_min = None
+        # 圈
+        self.lap_t0 = None; self.lap_no = 0
+        # 结果
+        self.arrivals = {}    # 站号 -> 到站次数
+        self.dwell = {}       # 站号 -> RunningStat
+        self.travel = {}      # (起站, 终站) -> RunningStat
+        self.seg_aeb_cnt = {} # (起站, 终站) -> 累计 AEB 次数
+        self.seg_min_d = {}   # (起站, 终站) -> 历史最近障距
+        self.lap_stat = RunningStat()
+        # 事件明细 (每站/每区间/每圈一条，随到站次数增长而非帧数)
+        self.station_log = {} # 站号 -> [[到站时刻, 停靠时长, 倒计时设定, 圈号], ...]
+        self.segment_log = {} # "A-B" -> [[出发时刻, 用时, AEB次数, 最近障距], ...]
+        self.lap_log = []     # [[起始时刻, 用时], ...]
+
+    def slot_of(self, sta):
+        """ 累计到站数 (已展开回绕) -> 圈内站号 (1..n) """
+        if self.n_sta and sta > 0: return (sta - 1) % self.n_sta + 1
+        return sta
+
+    # --- 帧入口 ---
+    def feed(self, t, st, dr, sp, sta, dat):
+        self.frames += 1; self.t_last = t
+        prev = self.prev_st
+        if st == ST_STATION:
+            if prev != ST_STATION or sta != self.last_sta:
+                if prev == ST_STATION: self._depart(t)
+                self._arrive(t, sta, dat)
+        else:
+            if prev == ST_STATION: self._depart(t)
+            # 计数器只会在到站时回绕，行驶中归零说明车辆复位
+            if sta == 0 and self.last_sta > 0: self.restart()
+            if self.seg_t0 is None and st != 0: self.seg_t0 = t  # 首次发车 / 复位后发车
+            if self.seg_t0 is not None:
+                if st == ST_AEB and prev != ST_AEB: self.seg_aeb += 1
+                if dat > 0 and (self.seg_min is None or dat < self.seg_min): self.seg_min = dat
+        if st == ST_AEB and prev != ST_AEB: self.aeb_total += 1
+        self.prev_st = st
+
+    def restart(self):
+        """ 车辆复位：丢弃未完成的区间与圈，计数器从头计 """
+        self.seg_t0 = None; self.lap_t0 = None; self.seg_from = 0
+        self.last_sta = 0; self.sta_abs = 0
+
+    def _arrive(self, t, sta, dat):
+        if self.last_sta < 0: n = sta
+        else:
+            d = (sta - self.last_sta) & 0xFF
+            if sta < self.last_sta and d > STA_WRAP_GAP:
+                self.restart(); n = sta    # 计数器倒退 (错过了行驶中的归零帧)：同样按复位处理
+            else: n = self.sta_abs + d     # 含 255 -> 0 回绕
+        slot = self.slot_of(n)
+        if self.seg_t0 is not None:
+            key = (self.seg_from, slot)
+            dt = t - self.seg_t0
+            self.travel.setdefault(key, RunningStat()).add(dt)
+            self.seg_aeb_cnt[key] = self.seg_aeb_cnt.get(key, 0) + self.seg_aeb
+            if self.seg_min is not None:
+                old = self.seg_min_d.get(key)
+                if old is None or self.seg_min < old: self.seg_min_d[key] = self.seg_min
+            self.segment_log.setdefault(f"{key[0]}-{key[1]}", []).append(
+                [round(self.seg_t0, 3), round(dt, 3), self.seg_aeb, self.seg_min])
+        if slot == 1:
+            if self.lap_t0 is not None:
+                self.lap_stat.add(t - self.lap_t0)
+                self.lap_log.append([round(self.lap_t0, 3), round(t - self.lap_t0, 3)])
+            self.lap_t0 = t; self.lap_no += 1
+        self.arrivals[slot] = self.arrivals.get(slot, 0) + 1
+        self.cur_station = slot; self.t_arrive = t; self.dwell_cmd = dat
+        self.last_sta = sta; self.sta_abs = n
+        self.seg_t0 = None
+
+    def _depart(self, t):
+        slot = self.cur_station
+        if slot is None: return
+        dt = t - self.t_arrive
+        self.dwell.setdefault(slot, RunningStat()).add(dt)
+        self.station_log.setdefault(slot, []).append(
+            [round(self.t_arrive, 3), round(dt, 3), self.dwell_cmd, self.lap_no])
+        self.seg_from = slot; self.seg_t0 = t; self.seg_aeb = 0; self.seg_min = None
+        self.cur_station = None
+
+    def finish(self):
+        """ 会话结束：以最后一帧时刻补齐尚未离站的停靠 (实时与重放共用，保证索引一致) """
+        if self.cur_station is not None and self.t_last is not None: self._depart(self.t_last)
+
+    # --- 查询 ---
+    def summary_rows(self):
+        """ 仪表盘表格行: (站号, 到站次数, 平均停靠, 上次停靠, 进站区间均时, 进站区间AEB, 进站区间最近障距) """
+        rows = []
+        for s in sorted(self.arrivals):
+            d = self.dwell.get(s, RunningStat())
+            into = [k for k in self.travel if k[1] == s]
+            n_arr = sum(self.travel[k].n for k in into)
+            tr_total = sum(self.travel[k].total for k in into)
+            aeb = sum(self.seg_aeb_cnt.get(k, 0) for k in into)
+            mins = [self.seg_min_d[k] for k in into if k in self.seg_min_d]
+            rows.append((s, self.arrivals[s], d.mean, d.last,
+                         tr_total / n_arr if n_arr else None, aeb, min(mins) if mins else None))
+        return rows
+
+    def to_index(self, session=""):
+        return {
+            "session": session,
+            "stations_per_lap": self.n_sta,
+            "frames": self.frames,
+            "aeb_total": self.aeb_total,
+            "laps": self.lap_log,
+            "stations": {str(k): v for k, v in self.station_log.items()},
+            "segments": self.segment_log,
+        }
+
+    def save_index(self, session_path):
+        path = index_path(session_path)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_index(os.path.basename(session_path)), f, ensure_ascii=False)
+        return path
+
+    @classmethod
+    def replay(cls, session_path, stations_per_lap=STATIONS_PER_LAP):
+        """ 重放一个会话文件，结束时补齐最后一次停靠 """
+        eng = cls(stations_per_lap)
+        for t, st, dr, sp, sta, dat in iter_session(session_path):
+            eng.feed(t, st, dr, sp, sta, dat)
+        eng.finish()
+        return eng
+
+
+def index_path(session_path):
+    return session_path[:-len(SESSION_EXT)] + INDEX_EXT
+
+
+class SessionIndex:
+    """ [分析] 跨会话的按站点索引；缺失或过期的索引按需从原始数据重建一次 """
+    def __init__(self, folder=SESSION_DIR, stations_per_lap=STATIONS_PER_LAP):
+        self.folder = folder
+        self.n_sta = stations_per_lap
+        self.sessions = []
+        self.stations = {}   # 站号 -> [(会话, 到站时刻, 停靠, 倒计时设定, 圈号)]
+        self.segments = {}   # "A-B" -> [(会话, 出发时刻, 用时, AEB, 最近障距)]
+        self.laps = []       # [(会话, 起始时刻, 用时)]
+        self.reload()
+
+    def reload(self):
+        self.sessions.clear(); self.stations.clear(); self.segments.clear(); self.laps.clear()
+        for p in list_sessions(self.folder):
+            idx = self._load(p)
+            name = idx["session"]
+            self.sessions.append(name)
+            for k, recs in idx["stations"].items():
+                self.stations.setdefault(int(k), []).extend((name, *r) for r in recs)
+            for k, recs in idx["segments"].items():
+                self.segments.setdefault(k, []).extend((name, *r) for r in recs)
+            self.laps.extend((name, *r) for r in idx["laps"])
+
+    def _load(self, session_path):
+        ip = index_path(session_path)
+        if os.path.exists(ip) and os.path.getmtime(ip) >= os.path.getmtime(session_path):
+            try:
+                with open(ip, encoding="utf-8") as f: return json.load(f)
+            except (OSError, ValueError): pass
+        eng = LapAnalytics.replay(session_path, self.n_sta)
+        eng.save_index(session_path)
+        return eng.to_index(os.path.basename(session_path))
+
+    def station(self, slot):
+        return self.stations.get(slot, [])
+
+    def segment(self, a, b):
+        return self.segments.get(f"{a}-{b}", [])
+
+    def best_laps(self, n=10):
+        return sorted(self.laps, key=lambda r: r[2])[:n]
+
+
+def _fmt(v, nd=2):
+    return "--" if v is None else f"{v:.{nd}f}"
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="跨会话站点/圈速查询")
+    ap.add_argument("folder", nargs="?", default=SESSION_DIR)
+    ap.add_argument("--stations-per-lap", type=int, default=STATIONS_PER_LAP)
+    ap.add_argument("--station", type=int, help="列出某站全部停靠记录")
+    ap.add_argument("--segment", help="列出某区间全部记录，如 1-2")
+    args = ap.parse_args()
+
+    ix = SessionIndex(args.folder, args.stations_per_lap)
+    print(f"会话 {len(ix.sessions)} 个，完整圈 {len(ix.laps)} 圈")
+    if args.station is not None:
+        for r in ix.station(args.station):
+            print(f"{r[0]}  t={r[1]:.2f}  停靠 {r[2]:.2f}s  设定 {r[3]}s  第{r[4]}圈")
+    elif args.segment:
+        for r in ix.segments.get(args.segment, []):
+            print(f"{r[0]}  t={r[1]:.2f}  用时 {r[2]:.2f}s  AEB {r[3]}  最近 {r[4]}cm")
+    else:
+        for r in ix.best_laps():
+            print(f"{r[0]}  t={r[1]:.2f}  圈速 {r[2]:.2f}s")
+        for s in sorted(ix.stations):
+            d = [r[2] for r in ix.stations[s]]
+            print(f"第{s}站: 停靠 {len(d)} 次, 平均 {_fmt(sum(d)/len(d))}s")
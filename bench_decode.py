@@ -0,0 +1,79 @@
+"""
+下行帧解码基准：原逐帧循环 vs decode_bulk
+
+场景：
+  1. 串口积压：按 4KB 分块送入 (与 loop() 中一次 read(in_waiting) 相当)
+  2. 抓包文件：按 1MB 分块送入 (与 iter_capture 相同)
+  3. 离线整段：整个字节流一次解码 (回放)
+每个场景分别测干净数据与含随机损坏的数据 (一半改写字节、一半丢字节造成错位)，并核对两种解码结果一致。
+
+用法: python bench_decode.py [帧数] [损坏率]
+"""
+import sys
+import time
+import random
+import struct
+
+from telemetry import decode_bulk, pack_frame, np
+
+
+def legacy_decode(buf):
+    """ 原 FinalSystem.loop 中的逐帧解析 (不含 UI 投递) """
+    out = []
+    while len(buf) >= 8:
+        if buf[0]!=0x55 or buf[7]!=0xAA:
+            buf=buf[1:]
+            continue
+        st, dr, sp, sta, dat, chk = struct.unpack('BBBBBB', buf[1:7])
+        if (st+dr+sp+sta+dat)&0xFF == chk:
+            out.append((st, dr, sp, sta, dat))
+            buf = buf[8:]
+        else:
+            buf=buf[1:]
+    return out, buf
+
+
+def make_stream(n, corrupt, seed=1):
+    rnd = random.Random(seed)
+    data = bytearray()
+    for _ in range(n):
+        data += pack_frame(rnd.randint(0, 3), rnd.randint(0, 4), rnd.randint(0, 1), rnd.randint(0, 20), rnd.randint(0, 250))
+    for k in range(int(n * corrupt)):
+        j = rnd.randrange(len(data))
+        if k % 2: del data[j]
+        else: data[j] = rnd.randrange(256)
+    return bytes(data)
+
+
+def run_chunked(fn, data, chunk=4096):
+    frames = []; buf = b''
+    for k in range(0, len(data), chunk):
+        out, buf = fn(buf + data[k:k+chunk])
+        frames.extend(out)
+    return frames
+
+
+def bench(label, fn, *args):
+    t0 = time.perf_counter()
+    frames = fn(*args)
+    dt = time.perf_counter() - t0
+    print(f"  {label:<28}{len(frames):>9} 帧 {dt*1000:>9.1f} ms {len(frames)/dt/1e6:>8.2f} M帧/s")
+    return frames
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    corrupt = float(sys.argv[2]) if len(sys.argv) > 2 else 0.005
+    print(f"numpy: {'可用' if np is not None else '未安装 (iter_unpack 回退)'}")
+    for rate in (0.0, corrupt):
+        data = make_stream(n, rate)
+        print(f"{n} 帧, 损坏率 {rate:.3%}:")
+        ref = bench("逐帧 (4KB 分块)", run_chunked, legacy_decode, data)
+        got = bench("decode_bulk (4KB 分块)", run_chunked, decode_bulk, data)
+        big = bench("decode_bulk (1MB 分块)", run_chunked, decode_bulk, data, 1 << 20)
+        whole = bench("decode_bulk (整段)", lambda d: decode_bulk(d)[0], data)
+        assert got == ref and big == ref and whole == ref, "解码结果不一致"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+循迹小车仿真器 (remote.c 状态机的简化模型)
+
+  - 自动巡航：按设定功率沿赛道前进，到站后进入 st=3 停靠，dat 为倒计时秒数，sta 计数 +1
+  - 随机障碍：距离 < 60cm 降速 (sp=0)，< 20cm 触发 AEB (st=2) 直至障碍移开；
+    制动按有限减速度滑行，功率越高刹停时离障碍越近，刹不住即记一次碰撞
+  - 手动模式：按 0xA5 控制帧的摇杆值给出 dr，不前进
+  - 0xB5 参数帧：设定巡航功率与停靠时长
+  - 0xC5 探针帧：在之后的下行帧 Spd 高 7 位回显 Tag (--legacy 模拟不支持回显的旧固件)
+  - 处理延迟 (--delay)：上行指令在收到后延迟若干秒才生效，用作延迟探针的对端
+
+既可在进程内按仿真时间任意快速推进 (SimCar.step)，也可通过 pty 以真实时间对接上位机：
+    python car_sim.py --baud 115200 --parity N
+打印出的 /dev/pts/N 即可在上位机中作为端口连接。若上位机打开端口时的波特率/校验位与
+--baud/--parity 不一致，仿真器会像真实 UART 失配一样输出乱码，用于验证自动检测。
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from collections import deque
+
+from telemetry import (ST_IDLE, ST_CRUISE, ST_AEB, ST_STATION, STATIONS_PER_LAP,
+                       TX_HEADER, TX_TAIL, SET_HEADER, SET_TAIL, PROBE_HEADER, PROBE_TAIL,
+                       ECHO_SHIFT, joy_to_dr, pack_frame)
+
+VMAX = 60.0          # 100% 功率巡航速度 (cm/s)
+SEG_LEN = 300.0      # 站间距离 (cm)
+SLOW_DIST = 60       # 降速距离 (cm)
+AEB_DIST = 20        # 紧急制动距离 (cm)
+FAR_DIST = 250       # 超声波量程 (无障碍时的读数)
+BRAKE_DECEL = 50.0   # AEB 制动减速度 (cm/s²)
+
+
+class SimCar:
+    """ [仿真] 单台小车；所有时间均为仿真时间 (秒) """
+    def __init__(self, speed=60, dwell=10, stations=STATIONS_PER_LAP, obstacle_prob=0.3,
+                 obstacle_hold=1.5, brake_decel=BRAKE_DECEL, delay=0.0, echo=True, seed=None):
+        self.rnd = random.Random(seed)
+        self.speed = speed; self.dwell = dwell
+        self.stations = stations
+        self.obstacle_prob = obstacle_prob; self.obstacle_hold = obstacle_hold
+        self.brake_decel = brake_decel
+        self.v = 0.0              # 当前车速 (cm/s)
+        self.collisions = 0
+        self.t = 0.0
+        self.st = ST_CRUISE; self.dr = 1; self.sp = 1; self.sta = 0; self.dat = FAR_DIST
+        self.pos = 0.0
+        self.countdown = 0.0
+        self.obstacle = None      # 障碍在本区间的位置 (cm)
+        self.aeb_left = 0.0
+        self.mode = 0; self.joy_x = 0; self.joy_y = 0
+        self.rx = b''
+        self.delay = delay; self.echo = echo
+        self.cmds = deque()       # 延迟生效的上行指令 (生效时刻, 帧头, a, b, c)
+        self.echo_tag = 0
+        self._new_segment()
+
+    def _new_segment(self):
+        self.pos = 0.0
+        self.obstacle = None
+        if self.rnd.random() < self.obstacle_prob:
+            self.obstacle = self.rnd.uniform(SEG_LEN * 0.3, SEG_LEN * 0.9)
+
+    # --- 上行指令 ---
+    def handle_bytes(self, data):
+        """ 解析上位机下发的 0xA5 控制帧、0xB5 参数帧与 0xC5 探针帧 """
+        buf = self.rx + data
+        i = 0
+        tails = {TX_HEADER: TX_TAIL, SET_HEADER: SET_TAIL, PROBE_HEADER: PROBE_TAIL}
+        while len(buf) - i >= 6:
+            h = buf[i]
+            if tails.get(h) == buf[i+5] and sum(buf[i+1:i+4]) & 0xFF == buf[i+4]:
+                cmd = (h, buf[i+1], buf[i+2], buf[i+3])
+                if self.delay > 0: self.cmds.append((self.t + self.delay,) + cmd)
+                else: self._apply(*cmd)
+                i += 6
+            else:
+                i += 1
+        self.rx = buf[i:]
+
+    def _apply(self, h, a, b, c):
+        if h == TX_HEADER:
+            self.joy_x = a - 256 if a > 127 else a
+            self.joy_y = b - 256 if b > 127 else b
+            self.mode = c
+        elif h == SET_HEADER:
+            self.speed, self.dwell = a, b
+        elif self.echo:
+            self.echo_tag = a
+
+    # --- 状态机 ---
+    def step(self, dt):
+        self.t += dt
+        cmds = self.cmds
+        while cmds and cmds[0][0] <= self.t:
+            self._apply(*cmds.popleft()[1:])
+        if self.mode:
+            self.st = ST_IDLE; self.sp = 0
+            self.dr = joy_to_dr(self.joy_x, self.joy_y)
+            self.dat = self._reading()
+            return
+        if self.st == ST_IDLE: self.st = ST_CRUISE
+
+        if self.st == ST_STATION:
+            self.countdown -= dt
+            self.dat = max(0, int(self.countdown + 0.999))
+            if self.countdown <= 0:
+                self.st = ST_CRUISE; self._new_segment()
+            return
+
+        if self.st == ST_AEB:
+            self.aeb_left -= dt
+            if self.v > 0: self._coast(dt)
+            if self.aeb_left <= 0:
+                self.obstacle = None     # 障碍移开
+                self.st = ST_CRUISE
+            self.dat = self._reading()
+            return
+
+        # 巡航
+        d = self._reading()
+        self.sp = 0 if d < SLOW_DIST else 1
+        v = self.v = VMAX * self.speed / 100.0 * (0.5 if self.sp == 0 else 1.0)
+        self.dr = 1 if v > 0 else 0
+        self.pos += v * dt
+        self.dat = self._reading()
+        if self.dat < AEB_DIST:
+            self.st = ST_AEB; self.dr = 0; self.aeb_left = self.obstacle_hold
+        elif self.pos >= SEG_LEN:
+            self.st = ST_STATION; self.dr = 0; self.sta = (self.sta + 1) & 0xFF
+            self.countdown = float(self.dwell); self.dat = self.dwell
+
+    def _coast(self, dt):
+        """ AEB 制动滑行：匀减速，撞上障碍则停在障碍处 """
+        self.v = max(0.0, self.v - self.brake_decel * dt)
+        self.pos += self.v * dt
+        if self.obstacle is not None and self.pos >= self.obstacle:
+            self.pos = self.obstacle; self.v = 0.0
+            self.collisions += 1
+
+    def _reading(self):
+        if self.obstacle is None: return FAR_DIST
+        gap = self.obstacle - self.pos
+        return max(1, min(FAR_DIST, int(gap))) if gap >= 0 else FAR_DIST
+
+    def frame(self):
+        return self.st, self.dr, self.sp | (self.echo_tag << ECHO_SHIFT), self.sta, self.dat
+
+    def run(self, duration, rate):
+        """ 按仿真时间推进，逐帧产出 (t, st, dr, sp, sta, dat)，不做任何等待 """
+        dt = 1.0 / rate
+        t_end = self.t + duration
+        while self.t < t_end:
+            self.step(dt)
+            yield (self.t,) + self.frame()
+
+
+# =================================================================
+# [进程内对接] 供测试工具直接当作串口使用 (无需 pty/pyserial)
+# =================================================================
+
+class SimSerial:
+    """ [仿真] 进程内假串口：按“墙钟 × 加速倍数”推进仿真小车，in_waiting 时生成到当前仿真时刻的全部帧 """
+    def __init__(self, car, rate=50, accel=1.0):
+        self.car = car; self.rate = rate; self.accel = accel
+        self.t0 = time.perf_counter()
+        self.buf = bytearray()
+        self.sim_t = 0.0
+        self.is_open = True
+
+    def _pump(self):
+        target = (time.perf_counter() - self.t0) * self.accel
+        dt = 1.0 / self.rate
+        car, buf = self.car, self.buf
+        while self.sim_t < target:
+            car.step(dt); self.sim_t += dt
+            buf += pack_frame(*car.frame())
+
+    @property
+    def in_waiting(self):
+        self._pump()
+        return len(self.buf)
+
+    def read(self, n=1):
+        out = bytes(self.buf[:n]); del self.buf[:n]
+        return out
+
+    def write(self, data):
+        self._pump()   # 先追到当前时刻，指令按实际收到的仿真时刻生效
+        self.car.handle_bytes(data)
+        return len(data)
+
+    def reset_input_buffer(self): self.buf.clear()
+    def close(self): self.is_open = False
+
+
+def line_mismatch(raw, rnd, baud, parity, rx_baud, rx_parity):
+    """ 车端以 (baud, parity) 发出的字节，在接收端按 (rx_baud, rx_parity) 解读后的样子 """
+    if rx_baud == baud and rx_parity == parity: return raw
+    if rx_baud == baud:
+        # 仅校验位失配：约一半字节出错
+        return bytes(b ^ (1 << rnd.randrange(8)) if rnd.random() < 0.5 else b for b in raw)
+    n = max(1, round(len(raw) * rx_baud / baud)) if rx_baud else len(raw)
+    return bytes(rnd.randrange(256) for _ in range(n))
+
+
+# =================================================================
+# [pty 对接] 以真实时间把仿真小车暴露为一个串口设备 (仅 Linux/macOS)
+# =================================================================
+
+class PtyServer:
+    """ [仿真] pty 串口：按客户端实际配置的波特率/校验位决定输出是否失配 """
+    def __init__(self, car, baud=115200, parity="N", rate=50):
+        import tty, termios
+        self.termios = termios
+        self.car = car
+        self.baud = baud; self.parity = parity
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.path = os.ttyname(self.slave)
+        # 一帧 8 字节，每字节 10 位 (校验位再 +1)，速率不能超过链路上限
+        bits = 11 if parity != "N" else 10
+        self.rate = min(rate, baud / (bits * 8))
+        self.speeds = {getattr(termios, f"B{b}"): b for b in
+                       (9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600) if hasattr(termios, f"B{b}")}
+        self.running = True
+
+    def client_settings(self):
+        """ 从 pty 从端读取客户端 (pyserial) 设定的 (波特率, 校验位) """
+        attrs = self.termios.tcgetattr(self.slave)
+        cflag, ospeed = attrs[2], attrs[5]
+        if not cflag & self.termios.PARENB: parity = "N"
+        elif cflag & self.termios.PARODD: parity = "O"
+        else: parity = "E"
+        return self.speeds.get(ospeed), parity
+
+    def encode(self, raw):
+        baud, parity = self.client_settings()
+        return line_mismatch(raw, self.car.rnd, self.baud, self.parity, baud, parity)
+
+    def serve_forever(self):
+        import select
+        period = 1.0 / self.rate
+        t_next = time.monotonic()
+        while self.running:
+            now = time.monotonic()
+            if now >= t_next:
+                self.car.step(period)
+                try: os.write(self.master, self.encode(pack_frame(*self.car.frame())))
+                except OSError: pass
+                t_next += period
+                if t_next < now: t_next = now + period   # 落后太多时不追帧
+            r, _, _ = select.select([self.master], [], [], max(0.0, t_next - time.monotonic()))
+            if r:
+                try: self.car.handle_bytes(os.read(self.master, 4096))
+                except OSError: pass
+
+    def close(self):
+        self.running = False
+        os.close(self.master); os.close(self.slave)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="循迹小车仿真器 (pty 串口)")
+    ap.add_argument("--baud", type=int, default=115200)
+    ap.add_argument("--parity", choices=("N", "E", "O"), default="N")
+    ap.add_argument("--rate", type=float, default=50, help="遥测帧率 (帧/秒)")
+    ap.add_argument("--speed", type=int, default=60, help="初始巡航功率 (%)")
+    ap.add_argument("--dwell", type=int, default=10, help="初始停靠时长 (秒)")
+    ap.add_argument("--stations", type=int, default=STATIONS_PER_LAP)
+    ap.add_argument("--delay", type=float, default=0.0, help="车端指令处理延迟 (秒)")
+    ap.add_argument("--legacy", action="store_true", help="旧固件：不回显延迟探针")
+    ap.add_argument("--seed", type=int)
+    args = ap.parse_args(argv)
+
+    car = SimCar(args.speed, args.dwell, args.stations, delay=args.delay, echo=not args.legacy, seed=args.seed)
+    srv = PtyServer(car, args.baud, args.parity, args.rate)
+    print(f"仿真小车已就绪: {srv.path}  ({args.baud}bps, 校验 {args.parity}, {srv.rate:.0f} 帧/秒)")
+    sys.stdout.flush()
+    try: srv.serve_forever()
+    except KeyboardInterrupt: pass
+    finally: srv.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""
+会话数据导出工具
+
+把 sessions/*.tlm 录制的遥测转换为：
+  1. 列式分块文件 (每列 .npy 分块 / 每列 .csv / 或 Parquet，视已安装的库而定)
+  2. XLSX 汇总报表 (概览、圈速、站点停靠、区间、AEB 事件)，流式写出，内存占用恒定
+
+按固定记录数分块处理，GB 级会话也不会整体载入内存；多个会话文件并行分配到所有 CPU 核。
+
+用法: python export_tool.py [会话文件或目录 ...] -o export --format auto --jobs 0
+"""
+import os
+import sys
+import zipfile
+import tempfile
+import datetime
+import argparse
+from xml.sax.saxutils import escape
+from concurrent.futures import ProcessPoolExecutor
+
+from telemetry import COLUMNS, ST_AEB, SESSION_DIR, SESSION_EXT, iter_column_chunks, list_sessions, np
+from analytics import LapAnalytics
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+CHUNK_RECORDS = 1 << 20   # 每块 1M 条记录 (约 16MB 原始数据)
+
+
+# =================================================================
+# [列式输出]
+# =================================================================
+
+class NpySink:
+    """ [导出] 每列每块一个 .npy：t.00000.npy, st.00000.npy ... """
+    def __init__(self, folder):
+        self.folder = folder; self.k = 0
+
+    def write(self, cols):
+        for c in COLUMNS:
+            np.save(os.path.join(self.folder, f"{c}.{self.k:05d}.npy"), np.asarray(cols[c]))
+        self.k += 1
+
+    def close(self): pass
+
+
+class CsvSink:
+    """ [导出] 每列一个 .csv (单列、无表头)，逐块追加 """
+    def __init__(self, folder):
+        self.files = {c: open(os.path.join(folder, f"{c}.csv"), "w", encoding="utf-8") for c in COLUMNS}
+
+    def write(self, cols):
+        for c in COLUMNS:
+            vals = cols[c].tolist() if hasattr(cols[c], "tolist") else cols[c]
+            if not vals: continue
+            fmt = "{:.6f}" if c == "t" else "{}"
+            self.files[c].write("\n".join(map(fmt.format, vals)) + "\n")
+
+    def close(self):
+        for f in self.files.values(): f.close()
+
+
+class ParquetSink:
+    """ [导出] 单个 frames.parquet，每块一个 row group """
+    SCHEMA = None
+
+    def __init__(self, folder):
+        if ParquetSink.SCHEMA is None:
+            ParquetSink.SCHEMA = pa.schema([("t", pa.float64())] + [(c, pa.uint8()) for c in COLUMNS[1:]])
+        self.w = pq.ParquetWriter(os.path.join(folder, "frames.parquet"), ParquetSink.SCHEMA)
+
+    def write(self, cols):
+        arrays = [pa.array(cols[c], type=f.type) for c, f in zip(COLUMNS, ParquetSink.SCHEMA)]
+        self.w.write_table(pa.Table.from_arrays(arrays, schema=ParquetSink.SCHEMA))
+
+    def close(self): self.w.close()
+
+
+SINKS = {"npy": NpySink, "csv": CsvSink, "parquet": ParquetSink}
+
+
+def resolve_format(fmt):
+    if fmt == "auto":
+        return "parquet" if pa is not None else ("npy" if np is not None else "csv")
+    if fmt == "parquet" and pa is None:
+        print("未安装 pyarrow，改用 npy/csv 导出", file=sys.stderr)
+        return resolve_format("auto")
+    if fmt == "npy" and np is None:
+        print("未安装 numpy，改用 csv 导出", file=sys.stderr)
+        return "csv"
+    return fmt
+
+
+# =================================================================
+# [XLSX 流式写出] 仅依赖标准库：工作表 XML 直接写入 zip 条目
+# =================================================================
+
+def _cell(v):
+    if v is None: return "<c/>"
+    if isinstance(v, (int, float)): return f'<c t="n"><v>{v}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(str(v))}</t></is></c>'
+
+
+class XlsxStreamWriter:
+    """ [导出] 极简 XLSX 写出器：逐行流式写表，内存与行数无关 """
+    def __init__(self, path):
+        self.z = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        self.sheets = []
+
+    def _begin(self, name, header):
+        self.sheets.append(name)
+        f = self.z.open(f"xl/worksheets/sheet{len(self.sheets)}.xml", "w", force_zip64=True)
+        f.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+        f.write(("<row>" + "".join(map(_cell, header)) + "</row>").encode("utf-8"))
+        return f
+
+    def add_sheet(self, name, header, rows):
+        """ rows 可以是任意可迭代对象 (生成器等)，逐行写出 """
+        with self._begin(name, header) as f:
+            for r in rows:
+                f.write(("<row>" + "".join(map(_cell, r)) + "</row>").encode("utf-8"))
+            f.write(b"</sheetData></worksheet>")
+
+    def add_sheet_xml_rows(self, name, header, row_file):
+        """ 行数据已预先序列化为 <row> XML 的临时文件，分块拷入 """
+        row_file.seek(0)
+        with self._begin(name, header) as f:
+            while True:
+                blk = row_file.read(1 << 20)
+                if not blk: break
+                f.write(blk)
+            f.write(b"</sheetData></worksheet>")
+
+    def close(self):
+        n = len(self.sheets)
+        ns_r = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+        self.z.writestr("[Content_Types].xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            + "".join(f'<Override PartName="/xl/worksheets/sheet{i}.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                      for i in range(1, n + 1)) + '</Types>')
+        self.z.writestr("_rels/.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{ns_r}/officeDocument" Target="xl/workbook.xml"/></Relationships>')
+        self.z.writestr("xl/workbook.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="{ns_r}"><sheets>'
+            + "".join(f'<sheet name="{escape(s)}" sheetId="{i}" r:id="rId{i}"/>' for i, s in enumerate(self.sheets, 1))
+            + '</sheets></workbook>')
+        self.z.writestr("xl/_rels/workbook.xml.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(f'<Relationship Id="rId{i}" Type="{ns_r}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+                      for i in range(1, n + 1)) + '</Relationships>')
+        self.z.close()
+
+
+# =================================================================
+# [单会话导出] 一次顺序扫描：列式分块 + 统计引擎 + AEB 事件
+# =================================================================
+
+def export_session(path, out_dir, fmt, chunk_records=CHUNK_RECORDS, xlsx=True):
+    name = os.path.basename(path)[:-len(SESSION_EXT)]
+    col_dir = os.path.join(out_dir, name)
+    os.makedirs(col_dir, exist_ok=True)
+    sink = SINKS[fmt](col_dir)
+
+    eng = LapAnalytics()
+    aeb_rows = tempfile.TemporaryFile()   # AEB 事件行先落临时文件，保持内存恒定
+    aeb_n = 0; aeb_t0 = None; aeb_min = None; aeb_seg = 0
+    aeb_pend = []   # 当前区间内已结束的 AEB 事件：到站知道区间终点后再写出
+    t0 = None; t = 0.0; total = 0; valid = 0
+
+    def flush_aeb(to):
+        """ 写出待定的 AEB 行，所在区间记为 起站→终站 (会话结束时仍未到站记为 --) """
+        for n_, a, d, m, seg in aeb_pend:
+            row = (n_, a, d, m, f"{seg}→{'--' if to is None else to}")
+            aeb_rows.write(("<row>" + "".join(map(_cell, row)) + "</row>").encode("utf-8"))
+        aeb_pend.clear()
+
+    for cols, n in iter_column_chunks(path, chunk_records):
+        total += n
+        sink.write(cols)
+        lists = [cols[c].tolist() if hasattr(cols[c], "tolist") else cols[c] for c in COLUMNS]
+        valid += len(lists[0])
+        if t0 is None and lists[0]: t0 = lists[0][0]
+        feed = eng.feed
+        for t, st, dr, sp, sta, dat in zip(*lists):
+            feed(t, st, dr, sp, sta, dat)
+            if st == ST_AEB:
+                if aeb_t0 is None:
+                    aeb_t0 = t; aeb_min = dat or None; aeb_seg = eng.seg_from
+                elif dat > 0 and (aeb_min is None or dat < aeb_min):
+                    aeb_min = dat
+            elif aeb_t0 is not None:
+                aeb_n += 1
+                aeb_pend.append((aeb_n, round(aeb_t0 - t0, 3), round(t - aeb_t0, 3), aeb_min, aeb_seg))
+                aeb_t0 = None
+            if aeb_pend and eng.cur_station is not None: flush_aeb(eng.cur_station)
+    sink.close()
+    # 会话在 AEB 期间结束：按最后一帧截止补记这次事件
+    if aeb_t0 is not None:
+        aeb_n += 1
+        aeb_pend.append((aeb_n, round(aeb_t0 - t0, 3), round(t - aeb_t0, 3), aeb_min, aeb_seg))
+    flush_aeb(None)
+    eng.finish()
+    t0 = t0 or 0.0
+
+    report = None
+    if xlsx:
+        report = os.path.join(out_dir, f"{name}.xlsx")
+        wb = XlsxStreamWriter(report)
+        start = datetime.datetime.fromtimestamp(t0).strftime("%Y-%m-%d %H:%M:%S") if t0 else "--"
+        wb.add_sheet("概览", ("项目", "数值"), [
+            ("会话", name), ("开始时间", start), ("记录总数", total), ("有效帧", valid),
+            ("时长(s)", round(t - t0, 3)), ("完整圈数", eng.lap_stat.n),
+            ("最快圈(s)", eng.lap_stat.min), ("平均圈(s)", eng.lap_stat.mean), ("AEB 次数", eng.aeb_total),
+        ])
+        wb.add_sheet("圈速", ("圈号", "起始(s)", "用时(s)"),
+                     ((i, round(a - t0, 3), d) for i, (a, d) in enumerate(eng.lap_log, 1)))
+        wb.add_sheet("站点停靠", ("站点", "到站(s)", "停靠(s)", "倒计时设定(s)", "圈号"),
+                     ((s, round(r[0] - t0, 3), r[1], r[2], r[3])
+                      for s in sorted(eng.station_log) for r in eng.station_log[s]))
+        wb.add_sheet("区间", ("区间", "出发(s)", "用时(s)", "AEB 次数", "最近障距(cm)"),
+                     ((k, round(r[0] - t0, 3), r[1], r[2], r[3])
+                      for k in sorted(eng.segment_log) for r in eng.segment_log[k]))
+        wb.add_sheet_xml_rows("AEB 事件", ("序号", "开始(s)", "持续(s)", "最近障距(cm)", "所在区间"), aeb_rows)
+        wb.close()
+    aeb_rows.close()
+    return {"session": name, "records": total, "valid": valid, "laps": eng.lap_stat.n,
+            "aeb": eng.aeb_total, "columns": col_dir, "report": report}
+
+
+def collect_inputs(paths):
+    out = []
+    for p in paths:
+        if os.path.isdir(p): out.extend(list_sessions(p))
+        elif p.endswith(SESSION_EXT): out.append(p)
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="会话遥测 -> 列式分块 + XLSX 报表")
+    ap.add_argument("inputs", nargs="*", default=[SESSION_DIR], help="会话文件或目录")
+    ap.add_argument("-o", "--out", default="export")
+    ap.add_argument("--format", choices=("auto", "npy", "csv", "parquet"), default="auto")
+    ap.add_argument("--chunk", type=int, default=CHUNK_RECORDS, help="每块记录数")
+    ap.add_argument("--jobs", type=int, default=0, help="并行进程数 (0 = CPU 核数)")
+    ap.add_argument("--no-xlsx", action="store_true")
+    args = ap.parse_args(argv)
+
+    files = collect_inputs(args.inputs)
+    if not files:
+        print("没有找到会话文件 (*.tlm)"); return 1
+    fmt = resolve_format(args.format)
+    os.makedirs(args.out, exist_ok=True)
+    jobs = min(args.jobs or os.cpu_count() or 1, len(files))
+
+    task = [(p, args.out, fmt, args.chunk, not args.no_xlsx) for p in files]
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            results = list(ex.map(export_session, *zip(*task)))
+    else:
+        results = [export_session(*a) for a in task]
+
+    for r in results:
+        print(f"{r['session']}: {r['valid']}/{r['records']} 帧, {r['laps']} 圈, AEB {r['aeb']} 次 -> {r['columns']}"
+              + (f", {r['report']}" if r['report'] else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
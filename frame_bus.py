@@ -0,0 +1,150 @@
+"""
+进程内遥测总线 (发布/订阅)
+
+读线程只负责解码并 publish，不再直接知道有哪些消费者。每个订阅者注册时选择投递策略：
+  SYNC   : 在发布线程内立即回调 (仅限微秒级的轻量处理，如派生事件、缓冲写盘)
+  QUEUED : 有界队列，满时丢弃最旧的一条；由消费方线程调用 drain() 取出处理
+  LATEST : 只保留最新一条 (界面显示)；drain() 至多回调一次
+慢消费者只会让自己的队列丢数据，永远不会阻塞串口读线程。
+回调抛出的异常按订阅者单独捕获并计数，不影响同一次发布的其他订阅者 (首次出错时通知 on_error)。
+
+每个订阅者独立统计：发布数 / 投递数 / 丢弃数 / 出错数 / 当前与最大积压 / 发布到投递的延迟。
+"""
+import time
+from collections import deque
+
+SYNC, QUEUED, LATEST = "sync", "queued", "latest"
+
+
+class Topic:
+    """ [总线] 主题：名称 + 回调参数字段 (仅作约定与文档，不做运行时检查) """
+    __slots__ = ("name", "fields")
+
+    def __init__(self, name, fields):
+        self.name = name; self.fields = tuple(fields)
+
+    def __repr__(self):
+        return f"Topic({self.name}: {', '.join(self.fields)})"
+
+
+# --- 遥测主题 ---
+T_FRAME   = Topic("frame",   ("st", "dr", "sp", "sta", "dat", "t"))   # 解码后的一帧
+T_STATE   = Topic("state",   ("old", "new", "t"))                     # st 状态切换
+T_STATION = Topic("station", ("sta", "t"))                            # 抵达站点 (st=3 且 sta 变化)
+T_AEB     = Topic("aeb",     ("on", "dat", "t"))                      # AEB 开始/结束
+T_LINK    = Topic("link",    ("up", "info", "t"))                     # 链路建立/断开
+T_RTT     = Topic("rtt",     ("rtt_ms", "stats", "t"))                # 延迟探针新样本 + 窗口统计
+
+
+class Subscription:
+    """ [总线] 单个订阅者及其投递队列与滞后统计 """
+    def __init__(self, topic, callback, policy, maxlen, name, on_error=None):
+        self.topic = topic; self.callback = callback; self.on_error = on_error
+        self.policy = policy; self.name = name or getattr(callback, "__name__", topic.name)
+        self.maxlen = maxlen if policy == QUEUED else 1
+        # (发布时刻, 参数) 成对存放：满队列上发布与取出并发时两者不会错位
+        self.items = deque(maxlen=self.maxlen)
+        self.published = 0; self.delivered = 0
+        self.max_depth = 0
+        self.errors = 0; self.last_error = None
+        self.lag_last = 0.0; self.lag_max = 0.0; self.lag_total = 0.0
+
+    def push(self, args):
+        self.published += 1
+        self.items.append((time.perf_counter(), args))
+        d = len(self.items)
+        if d > self.max_depth: self.max_depth = d
+
+    @property
+    def dropped(self):
+        """ 被挤出队列的条数 (由计数推算，发布与取出并发时不会多计或漏计) """
+        return max(0, self.published - self.delivered - len(self.items))
+
+    def drain(self, max_n=None):
+        """ 在消费方线程调用：依次回调积压项，返回本次处理条数 """
+        items, cb = self.items, self.callback
+        n = 0
+        while items and (max_n is None or n < max_n):
+            try: t_pub, args = items.popleft()
+            except IndexError: break
+            self.delivered += 1; n += 1
+            lag = time.perf_counter() - t_pub
+            self.lag_last = lag; self.lag_total += lag
+            if lag > self.lag_max: self.lag_max = lag
+            try: cb(*args)
+            except Exception as e: self.fail(e)
+        return n
+
+    def fail(self, e):
+        self.errors += 1; self.last_error = e
+        if self.errors == 1 and self.on_error: self.on_error(self, e)
+
+    def stats(self):
+        return {
+            "name": self.name, "topic": self.topic.name, "policy": self.policy,
+            "published": self.published, "delivered": self.delivered, "dropped": self.dropped,
+            "errors": self.errors, "depth": len(self.items), "max_depth": self.max_depth,
+            "lag_ms": self.lag_last * 1000, "lag_max_ms": self.lag_max * 1000,
+            "lag_avg_ms": self.lag_total / self.delivered * 1000 if self.delivered else 0.0,
+        }
+
+
+class FrameBus:
+    """ [总线] 按主题分发；同步订阅者直接回调，其余进入各自队列 """
+    def __init__(self, on_error=None):
+        self.sync = {}    # topic -> (Subscription, ...)
+        self.queued = {}  # topic -> (Subscription, ...)
+        self.subs = []
+        self.on_error = on_error   # (订阅, 异常)：每个订阅者首次出错时调用，在出错的线程内
+
+    def subscribe(self, topic, callback, policy=SYNC, maxlen=1024, name=None):
+        sub = Subscription(topic, callback, policy, maxlen, name, self.on_error)
+        self.subs.append(sub)
+        if policy == SYNC:
+            self.sync[topic] = self.sync.get(topic, ()) + (sub,)
+        else:
+            self.queued[topic] = self.queued.get(topic, ()) + (sub,)
+        return sub
+
+    def unsubscribe(self, sub):
+        if sub not in self.subs: return
+        self.subs.remove(sub)
+        if sub.policy == SYNC:
+            self.sync[sub.topic] = tuple(s for s in self.sync[sub.topic] if s is not sub)
+        else:
+            self.queued[sub.topic] = tuple(s for s in self.queued[sub.topic] if s is not sub)
+
+    def publish(self, topic, *args):
+        for sub in self.sync.get(topic, ()):
+            try: sub.callback(*args)
+            except Exception as e: sub.fail(e)
+        for sub in self.queued.get(topic, ()):
+            sub.push(args)
+
+    def metrics(self):
+        return [s.stats() for s in self.subs if s.policy != SYNC]
+
+
+class EventDeriver:
+    """ [总线] 同步订阅遥测帧，派生状态切换 / 到站 / AEB 事件 """
+    def __init__(self, bus):
+        self.bus = bus
+        self.reset()
+        bus.subscribe(T_FRAME, self.on_frame, SYNC, name="events")
+
+    def reset(self):
+        self.prev_st = -1
+        self.last_sta = -1
+
+    def on_frame(self, st, dr, sp, sta, dat, t):
+        prev = self.prev_st
+        if st != prev:
+            pub = self.bus.publish
+            pub(T_STATE, prev, st, t)
+            if st == 2: pub(T_AEB, True, dat, t)
+            elif prev == 2: pub(T_AEB, False, dat, t)
+            self.prev_st = st
+        # st=3 对应 remote.c 中的 STATE_STATION，sta 是当前站点计数
+        if st == 3 and sta != self.last_sta:
+            self.bus.publish(T_STATION, sta, t)
+            self.last_sta = sta
@@ -0,0 +1,183 @@
+"""
+PC <-> 小车 往返延迟 (RTT) 探针
+
+两种测量方式 (可同时工作，一旦收到过回显即只采用回显样本)：
+  回显 (echo)：需显式开启 (echo=True / --echo / 界面“回显探针”按钮)，仅用于已支持回显的固件。
+              定期随 0xA5 控制帧下发 0xC5 探针帧 (Tag 1..127)，车端在之后的下行帧 Spd 高 7 位回显该 Tag，
+              RTT = 发出探针 -> 首次收到带该 Tag 的下行帧
+  方向 (dr)  ：默认方式，不发送任何额外帧。在手动模式下记录每次摇杆指令使预期 Dir 改变的时刻，
+              RTT = 指令发出 -> 下行帧 Dir 首次变为预期值 (被动测量，不额外操纵车辆)
+样本进入滑动窗口，随时给出 p50/p90/p99/最大值。
+
+时间戳由调用方传入 (建议 time.perf_counter())，本模块不自行读钟，便于在读写线程内使用。
+读写线程的轮询周期会计入测得的 RTT，对比前后版本时应保持一致。
+
+独立运行 (对接内置仿真小车或实车串口)：
+    python latency_probe.py --delay 0.03 --seconds 20          # 仿真车，处理延迟 30ms
+    python latency_probe.py --delay 0.03 --legacy              # 仿真旧固件，用摇杆方向法
+    python latency_probe.py --port COM3 --baud 115200 --wiggle  # 实车旧固件 (需要 pyserial，车辆会原地转动)
+    python latency_probe.py --port COM3 --baud 115200 --echo    # 实车，固件已支持探针回显
+"""
+import sys
+import time
+import argparse
+from collections import deque
+
+from telemetry import ECHO_SHIFT, TAG_MAX, decode_bulk, joy_to_dr, pack_control, pack_probe
+
+PROBE_INTERVAL = 0.5   # 探针间隔 (秒)
+PROBE_TIMEOUT = 2.0    # 超过该时长未回显记为丢失 (秒)
+WINDOW = 256           # 滑动窗口样本数
+
+
+def percentile(sorted_vals, p):
+    """ 最近秩法 (nearest-rank) 百分位 """
+    n = len(sorted_vals)
+    if not n: return None
+    k = max(0, min(n - 1, int(p / 100.0 * n + 0.999999) - 1))
+    return sorted_vals[k]
+
+
+class LatencyProbe:
+    """ [链路] 往返延迟探针：产生探针帧、匹配回显/方向变化、维护滑动窗口统计 """
+    def __init__(self, interval=PROBE_INTERVAL, timeout=PROBE_TIMEOUT, window=WINDOW, echo=False):
+        self.interval = interval; self.timeout = timeout
+        self.echo = echo           # 是否下发 0xC5 探针帧 (旧固件不认识该帧，默认关闭)
+        self.samples = deque(maxlen=window)   # RTT 样本 (秒)
+        self.reset()
+
+    def reset(self):
+        self.samples.clear()
+        self.tag = 0
+        self.pending = {}          # tag -> 发出时刻
+        self.t_next = 0.0
+        self.echo_seen = False     # 对端支持回显后不再采用方向法样本
+        self.cmd_dr = None         # 最近一次指令对应的预期 Dir
+        self.dr_pending = None     # (预期 Dir, 指令时刻)
+        self.sent = 0; self.lost = 0
+        self.method = None
+
+    def set_echo(self, on):
+        """ 开关回显探针；关闭时丢弃尚未回显的探针，不计丢失 """
+        self.echo = bool(on)
+        if not on: self.pending.clear()
+
+    # --- 发送侧 ---
+    def due(self, now):
+        """ 回显探针开启且到期时返回一帧探针 (调用方负责写出)，否则 None """
+        if not self.echo or now < self.t_next or self.interval <= 0: return None
+        self.t_next = now + self.interval
+        self.tag = self.tag % TAG_MAX + 1
+        self.pending[self.tag] = now
+        self.sent += 1
+        return pack_probe(self.tag)
+
+    def on_control(self, now, jx, jy, mode):
+        """ 每次发出 0xA5 控制帧时调用；只记录让预期方向改变的那一次 """
+        if not mode:
+            self.cmd_dr = None; self.dr_pending = None; return
+        exp = joy_to_dr(jx, jy)
+        if exp != self.cmd_dr:
+            self.cmd_dr = exp; self.dr_pending = (exp, now)
+
+    # --- 接收侧 ---
+    def on_frame(self, now, dr, sp):
+        """ 每个下行帧调用 (sp 为原始字段)；产生新样本时返回 RTT (秒)，否则 None """
+        rtt = None
+        tag = sp >> ECHO_SHIFT
+        if tag:
+            self.echo_seen = True
+            t0 = self.pending.pop(tag, None)
+            if t0 is not None:
+                rtt = now - t0; self.method = "echo"
+        elif self.dr_pending is not None and not self.echo_seen and dr == self.dr_pending[0]:
+            rtt = now - self.dr_pending[1]; self.method = "dr"
+            self.dr_pending = None
+        if rtt is not None: self.samples.append(rtt)
+        return rtt
+
+    def expire(self, now):
+        """ 清理超时未回显的探针 (旧固件下探针全部超时，只计数不报错) """
+        if self.dr_pending and now - self.dr_pending[1] > self.timeout: self.dr_pending = None
+        old = [k for k, t0 in self.pending.items() if now - t0 > self.timeout]
+        for k in old: del self.pending[k]
+        if self.echo_seen: self.lost += len(old)
+
+    def stats(self):
+        """ 滑动窗口统计 (毫秒) """
+        v = sorted(self.samples)
+        ms = lambda x: None if x is None else x * 1000
+        return {"n": len(v), "method": self.method, "sent": self.sent, "lost": self.lost,
+                "p50": ms(percentile(v, 50)), "p90": ms(percentile(v, 90)),
+                "p99": ms(percentile(v, 99)), "max": ms(v[-1] if v else None)}
+
+
+def fmt_stats(s):
+    if not s["n"]: return "RTT: 等待样本..."
+    how = "回显" if s["method"] == "echo" else "方向"
+    return (f"RTT({how}) p50 {s['p50']:.0f} / p90 {s['p90']:.0f} / p99 {s['p99']:.0f} / 最大 {s['max']:.0f} ms"
+            f"  (样本 {s['n']}, 丢失 {s['lost']})")
+
+
+# =================================================================
+# [独立运行] 以控制环节拍收发，定期打印统计
+# =================================================================
+
+def run(ser, seconds, period, legacy_wiggle, echo=False, log=print):
+    probe = LatencyProbe(echo=echo)
+    buf = b''
+    t_end = time.perf_counter() + seconds
+    t_print = 0.0; k = 0
+    while time.perf_counter() < t_end:
+        now = time.perf_counter()
+        # 方向法需要指令变化：手动模式下左右原地旋转交替 (仅在仿真或架空时使用)
+        jx, mode = (0, 0) if not legacy_wiggle else ((80 if (k // 10) % 2 else -80), 1)
+        ser.write(pack_control(jx, 0, mode)); probe.on_control(now, jx, 0, mode)
+        pkt = probe.due(now)
+        if pkt: ser.write(pkt)
+        n = ser.in_waiting
+        if n: buf += ser.read(n)
+        frames, buf = decode_bulk(buf)
+        now = time.perf_counter()
+        for st, dr, sp, sta, dat in frames: probe.on_frame(now, dr, sp)
+        probe.expire(now)
+        if now >= t_print:
+            log(fmt_stats(probe.stats())); t_print = now + 1.0
+        k += 1
+        time.sleep(period)
+    return probe.stats()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="PC <-> 小车 往返延迟探针")
+    ap.add_argument("--port", help="实车串口 (不指定则使用内置仿真小车)")
+    ap.add_argument("--baud", type=int, default=115200)
+    ap.add_argument("--delay", type=float, default=0.03, help="仿真：车端处理延迟 (秒)")
+    ap.add_argument("--legacy", action="store_true", help="仿真：旧固件 (不回显)，改用摇杆方向法")
+    ap.add_argument("--echo", action="store_true", help="实车：下发 0xC5 探针帧 (仅限已支持回显的固件)")
+    ap.add_argument("--wiggle", action="store_true", help="实车：手动模式左右交替以产生方向变化 (车辆会原地转动!)")
+    ap.add_argument("--rate", type=float, default=50, help="仿真遥测帧率")
+    ap.add_argument("--period", type=float, default=0.05, help="收发轮询周期 (秒)，与上位机 loop 一致")
+    ap.add_argument("--seconds", type=float, default=20)
+    args = ap.parse_args(argv)
+
+    if args.port:
+        import serial   # 仅实车模式需要
+        ser = serial.Serial(args.port, args.baud, timeout=0.05)
+        wiggle, echo = args.wiggle, args.echo
+    else:
+        from car_sim import SimCar, SimSerial
+        ser = SimSerial(SimCar(delay=args.delay, echo=not args.legacy, seed=1), args.rate)
+        wiggle, echo = args.legacy, not args.legacy
+    if not echo and not wiggle:
+        print("未开启回显探针 (--echo) 也未产生方向变化 (--wiggle)，不会有样本", file=sys.stderr)
+    try:
+        s = run(ser, args.seconds, args.period, wiggle, echo)
+    finally:
+        ser.close()
+    print(fmt_stats(s))
+    return 0 if s["n"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
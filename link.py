@@ -0,0 +1,66 @@
+"""
+串口链路工具：波特率表与自动检测
+
+自动检测：依次以候选 (波特率, 校验位) 打开串口，被动监听一个短窗口，
+按合法 0x55…0xAA 帧数与校验通过率打分，选出得分最高的组合。
+检测期间不向车辆发送任何指令。
+"""
+import time
+
+from telemetry import FRAME_LEN, RX_TAIL, HDR_BYTE, decode_bulk
+
+# 下拉框候选 (也可直接输入自定义数值)
+BAUD_RATES = ["9600", "19200", "38400", "57600", "115200", "230400", "460800", "921600"]
+BAUD_AUTO = "自动检测"
+
+# 自动检测候选：常用速率优先；校验位 N/E/O (8 数据位才能承载 0xAA 帧尾)
+DETECT_BAUDS = (115200, 9600, 230400, 460800, 921600, 57600, 38400, 19200)
+DETECT_PARITIES = ("N", "E", "O")
+PARITY_LABELS = {"N": "无 (None)", "O": "奇 (Odd)", "E": "偶 (Even)", "M": "Mark", "S": "Space"}
+
+
+def score_bytes(data):
+    """ 对一段接收数据打分，返回 (得分, 合法帧数, 校验通过率)
+        候选帧 = 帧头帧尾对齐的位置；通过率 = 合法帧 / 候选帧 """
+    frames, _ = decode_bulk(data)
+    valid = len(frames)
+    cand = 0
+    n = len(data)
+    i = data.find(HDR_BYTE)
+    while 0 <= i <= n - FRAME_LEN:
+        if data[i+7] == RX_TAIL: cand += 1
+        i = data.find(HDR_BYTE, i + 1)
+    rate = valid / cand if cand else 0.0
+    return valid * rate, valid, rate
+
+
+def auto_detect(open_port, bauds=DETECT_BAUDS, parities=DETECT_PARITIES, window=0.3,
+                good_frames=20, log=None):
+    """ open_port(baud, parity) -> 已打开的串口对象 (需支持 read/in_waiting/close)
+        返回 (baud, parity, 得分, 合法帧数, 通过率)；全部候选都无有效帧时返回 None
+        某组合在窗口内收到 good_frames 帧且全部通过校验时提前锁定 """
+    best = None
+    for b in bauds:
+        for p in parities:
+            try:
+                ser = open_port(b, p)
+            except Exception as e:
+                if log: log(f"自动检测: {b}bps/{p} 打开失败 ({e})")
+                continue
+            try:
+                ser.reset_input_buffer()
+                data = b''
+                t_end = time.time() + window
+                while time.time() < t_end:
+                    n = ser.in_waiting
+                    if n: data += ser.read(n)
+                    else: time.sleep(0.01)
+            finally:
+                ser.close()
+            score, valid, rate = score_bytes(data)
+            if log: log(f"自动检测: {b}bps/{p} -> 合法帧 {valid}, 通过率 {rate:.0%}")
+            if valid and (best is None or score > best[2]):
+                best = (b, p, score, valid, rate)
+            if valid >= good_frames and rate >= 1.0:
+                return best
+    return best
@@ -0,0 +1,236 @@
+"""
+巡航参数扫描 (巡航功率 × 停靠时长)
+
+对每组 (功率 %, 停靠秒数)：下发 0xB5 参数帧 -> 等满 N 个完整圈 (按 sta 计数器判圈，见 analytics.py)
+-> 记录圈速、AEB 次数、最近障距。结果按“安全优先、圈速其次”排序输出。
+
+  仿真 (默认)：每个参数点 × 每个随机种子一台 SimCar，按仿真时间全速推进，多进程并行；
+              各参数点使用同一组种子 (同样的障碍序列)，比较更公平
+  实车 (--port)：逐点下发参数，按真实时间等待圈数 (需要 pyserial)
+
+安全判定：跑满圈数、无碰撞、最近障距不低于 --safe-dist
+搜索方式：网格 (--speeds / --dwells)；--refine K 在当前最优安全点附近逐轮减半步长再扫 K 轮
+          (细化不超出用户给定各轴的最小/最大值，只给了单个值的轴保持不变)
+
+用法: python param_sweep.py --speeds 40:100:10 --dwells 3:10:1 --laps 5 --trials 4 [--refine 2] [--csv sweep.csv]
+      python param_sweep.py --port COM3 --baud 115200 --speeds 50,60,70 --dwells 5 --laps 3
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from telemetry import ST_STATION, STATIONS_PER_LAP, decode_bulk, pack_control, pack_settings
+from analytics import LapAnalytics
+from car_sim import SimCar
+
+SIM_RATE = 50          # 仿真遥测帧率 (帧/秒)，与实车一致
+SIM_TIMEOUT = 1800     # 单个参数点的仿真时长上限 (秒)
+SERIAL_TIMEOUT = 600   # 实车单个参数点的等待上限 (秒)
+SAFE_DIST = 12         # 最近障距下限 (cm)
+SPEED_RANGE = (0, 100)
+DWELL_RANGE = (0, 255)
+
+
+def parse_values(text):
+    """ "40:100:10" -> 区间 (含端点)；"50,60,70" -> 列表 """
+    if ":" in text:
+        a, b, step = (int(x) for x in text.split(":"))
+        return list(range(a, b + 1, step))
+    return [int(x) for x in text.split(",")]
+
+
+class LapMeter:
+    """ [扫描] 单个参数点的测量：圈速 (LapAnalytics 按 sta 判圈) + AEB 次数 + 最近障距 """
+    def __init__(self, stations=STATIONS_PER_LAP):
+        self.eng = LapAnalytics(stations)
+        self.min_d = None
+
+    def feed(self, t, st, dr, sp, sta, dat):
+        self.eng.feed(t, st, dr, sp, sta, dat)
+        # 停靠时 dat 是倒计时，不是距离
+        if st != ST_STATION and dat > 0 and (self.min_d is None or dat < self.min_d): self.min_d = dat
+
+    @property
+    def laps(self):
+        return self.eng.lap_stat.n
+
+    def result(self, speed, dwell, elapsed, collisions=0):
+        ls = self.eng.lap_stat
+        return {"speed": speed, "dwell": dwell, "laps": ls.n, "lap_total": ls.total,
+                "lap_best": ls.min, "aeb": self.eng.aeb_total, "min_d": self.min_d,
+                "collisions": collisions, "elapsed": elapsed}
+
+
+# =================================================================
+# [仿真] 单次试验 (在工作进程中运行)
+# =================================================================
+
+def run_sim(speed, dwell, laps, seed, stations=STATIONS_PER_LAP, rate=SIM_RATE, timeout=SIM_TIMEOUT):
+    car = SimCar(stations=stations, seed=seed)
+    car.handle_bytes(pack_settings(speed, dwell))
+    meter = LapMeter(stations)
+    for t, st, dr, sp, sta, dat in car.run(timeout, rate):
+        meter.feed(t, st, dr, sp, sta, dat)
+        if meter.laps >= laps: break
+    return meter.result(speed, dwell, car.t, car.collisions)
+
+
+def merge(trials, laps, safe_dist):
+    """ 同一参数点的多次试验合并为一行 """
+    r = {"speed": trials[0]["speed"], "dwell": trials[0]["dwell"]}
+    n = sum(x["laps"] for x in trials)
+    r["laps"] = n
+    r["lap_mean"] = sum(x["lap_total"] for x in trials) / n if n else None
+    r["lap_best"] = min((x["lap_best"] for x in trials if x["lap_best"] is not None), default=None)
+    r["aeb"] = sum(x["aeb"] for x in trials)
+    r["aeb_per_lap"] = r["aeb"] / n if n else None
+    r["min_d"] = min((x["min_d"] for x in trials if x["min_d"] is not None), default=None)
+    r["collisions"] = sum(x["collisions"] for x in trials)
+    r["elapsed"] = sum(x["elapsed"] for x in trials)
+    r["safe"] = (all(x["laps"] >= laps for x in trials) and r["collisions"] == 0
+                 and (r["min_d"] is None or r["min_d"] >= safe_dist))
+    return r
+
+
+def rank_key(r):
+    inf = float("inf")
+    return (not r["safe"], inf if r["lap_mean"] is None else r["lap_mean"],
+            inf if r["aeb_per_lap"] is None else r["aeb_per_lap"], -(r["min_d"] or 0))
+
+
+def sweep_sim(points, args, ex):
+    """ 每个 (参数点, 种子) 一个任务，全部并行后按参数点合并 """
+    seeds = [args.seed + k for k in range(args.trials)]
+    task = [(s, d, args.laps, seed, args.stations, args.rate, args.timeout) for s, d in points for seed in seeds]
+    if ex: trials = list(ex.map(run_sim, *zip(*task), chunksize=max(1, len(task) // (4 * args.jobs))))
+    else: trials = [run_sim(*a) for a in task]
+    k = len(seeds)
+    return [merge(trials[i:i + k], args.laps, args.safe_dist) for i in range(0, len(trials), k)]
+
+
+# =================================================================
+# [实车] 串口逐点测量
+# =================================================================
+
+def sweep_serial(points, args, log=print):
+    import serial   # 仅实车模式需要
+    ser = serial.Serial(args.port, args.baud, timeout=0.05)
+    out = []
+    try:
+        for speed, dwell in points:
+            ser.write(pack_settings(speed, dwell))
+            log(f"下发参数: 功率 {speed}% 停靠 {dwell}s，等待 {args.laps} 圈...")
+            # 参数在下一次抵达 1 号站后才开始计圈，当前未完成的圈不计入
+            meter = LapMeter(args.stations); buf = b''
+            t0 = t_ctl = time.time()
+            while meter.laps < args.laps and time.time() - t0 < args.timeout:
+                now = time.time()
+                if now - t_ctl >= 0.1:
+                    ser.write(pack_control(0, 0, 0)); t_ctl = now   # 保持自动巡航
+                n = ser.in_waiting
+                if n: buf += ser.read(n)
+                frames, buf = decode_bulk(buf)
+                for f in frames: meter.feed(now, *f)
+                time.sleep(0.01)
+            r = merge([meter.result(speed, dwell, time.time() - t0)], args.laps, args.safe_dist)
+            log(fmt_row(r))
+            out.append(r)
+    finally:
+        ser.close()
+    return out
+
+
+# =================================================================
+# [搜索] 网格 + 局部细化
+# =================================================================
+
+def grid_step(values):
+    """ 网格最小步长；单个值的轴返回 0 (不细化) """
+    vals = sorted(set(values))
+    return min(b - a for a, b in zip(vals, vals[1:])) if len(vals) > 1 else 0
+
+
+def axis_limits(values, hard):
+    """ 细化范围：用户给定值的最小/最大值，再与协议硬限取交集 """
+    return max(min(values), hard[0]), min(max(values), hard[1])
+
+
+def refine_points(best, s_step, d_step, s_lim=SPEED_RANGE, d_lim=DWELL_RANGE):
+    """ 以最优点为中心的 3×3 邻域 (截断到各轴范围；步长为 0 的轴只取当前值) """
+    ss = sorted({min(max(best["speed"] + k * s_step, s_lim[0]), s_lim[1]) for k in (-1, 0, 1)})
+    ds = sorted({min(max(best["dwell"] + k * d_step, d_lim[0]), d_lim[1]) for k in (-1, 0, 1)})
+    return [(s, d) for s in ss for d in ds]
+
+
+def fmt_row(r, rank=None):
+    def f(v, spec=".1f"): return "--" if v is None else format(v, spec)
+    head = f"{rank:>4} " if rank is not None else ""
+    return (head + f"{r['speed']:>5}% {r['dwell']:>5}s {r['laps']:>5} {f(r['lap_mean']):>9} {f(r['lap_best']):>9}"
+            f" {f(r['aeb_per_lap'], '.2f'):>8} {f(r['min_d'], 'd'):>8} {r['collisions']:>5}  {'是' if r['safe'] else '否'}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="巡航参数 (功率 × 停靠时长) 扫描")
+    ap.add_argument("--speeds", default="40:100:10", help="巡航功率 %%，区间 a:b:步长 或逗号列表")
+    ap.add_argument("--dwells", default="5", help="停靠秒数，格式同上")
+    ap.add_argument("--laps", type=int, default=5, help="每个参数点需要的完整圈数")
+    ap.add_argument("--trials", type=int, default=4, help="仿真：每个参数点的小车数 (不同障碍序列)")
+    ap.add_argument("--refine", type=int, default=0, help="在最优安全点附近细化的轮数")
+    ap.add_argument("--safe-dist", type=int, default=SAFE_DIST, help="最近障距下限 (cm)")
+    ap.add_argument("--stations", type=int, default=STATIONS_PER_LAP)
+    ap.add_argument("--rate", type=float, default=SIM_RATE, help="仿真遥测帧率")
+    ap.add_argument("--timeout", type=float, help="单个参数点的时长上限 (秒)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--jobs", type=int, default=0, help="并行进程数 (0 = CPU 核数)")
+    ap.add_argument("--port", help="实车串口 (不指定则使用仿真)")
+    ap.add_argument("--baud", type=int, default=115200)
+    ap.add_argument("--csv", help="结果另存为 CSV")
+    args = ap.parse_args(argv)
+
+    speeds, dwells = parse_values(args.speeds), parse_values(args.dwells)
+    if args.timeout is None: args.timeout = SERIAL_TIMEOUT if args.port else SIM_TIMEOUT
+    args.jobs = args.jobs or os.cpu_count() or 1
+    s_step, d_step = grid_step(speeds), grid_step(dwells)
+    s_lim, d_lim = axis_limits(speeds, SPEED_RANGE), axis_limits(dwells, DWELL_RANGE)
+
+    results = {}
+    ex = ProcessPoolExecutor(max_workers=args.jobs) if not args.port and args.jobs > 1 else None
+    t0 = time.perf_counter()
+    try:
+        todo = [(s, d) for s in speeds for d in dwells]
+        for rnd in range(args.refine + 1):
+            todo = [p for p in todo if p not in results]
+            if todo:
+                print(f"第 {rnd + 1} 轮: {len(todo)} 个参数点" + ("" if args.port else f" × {args.trials} 台仿真车"))
+                rows = sweep_serial(todo, args) if args.port else sweep_sim(todo, args, ex)
+                for r in rows: results[(r["speed"], r["dwell"])] = r
+            if rnd == args.refine: break
+            best = min(results.values(), key=rank_key)
+            if not best["safe"]:
+                print("没有安全的参数点，停止细化"); break
+            s_step, d_step = (step and max(1, step // 2) for step in (s_step, d_step))
+            todo = refine_points(best, s_step, d_step, s_lim, d_lim)
+    finally:
+        if ex: ex.shutdown()
+
+    ranked = sorted(results.values(), key=rank_key)
+    print(f"\n共 {len(ranked)} 个参数点，用时 {time.perf_counter() - t0:.1f}s")
+    print(f"{'排名':>4} {'功率':>6} {'停靠':>6} {'圈数':>5} {'平均圈速':>9} {'最快圈':>9} {'AEB/圈':>8} {'最近障距':>8} {'碰撞':>5}  安全")
+    for i, r in enumerate(ranked, 1): print(fmt_row(r, i))
+    if ranked and ranked[0]["safe"]:
+        b = ranked[0]
+        print(f"\n推荐: 巡航功率 {b['speed']}%  停靠 {b['dwell']}s  (平均圈速 {b['lap_mean']:.1f}s)")
+
+    if args.csv:
+        keys = ("speed", "dwell", "laps", "lap_mean", "lap_best", "aeb", "aeb_per_lap", "min_d", "collisions", "safe")
+        with open(args.csv, "w", encoding="utf-8") as f:
+            f.write("rank," + ",".join(keys) + "\n")
+            for i, r in enumerate(ranked, 1):
+                f.write(f"{i}," + ",".join("" if r[k] is None else str(round(r[k], 3)) for k in keys) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
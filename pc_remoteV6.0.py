@@ -2,12 +2,12 @@ import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import threading
 import time
-import struct
 import math
 import datetime
 import sys
 import random
 import pygame
+from collections import deque
 import os # 【新增】用于文件操作
 
 # --- 1. 环境自检 ---
@@ -19,9 +19,14 @@ except ImportError:
     ctypes.windll.user32.MessageBoxW(0, "启动失败：缺少 pyserial 库！\n请打开CMD输入: pip install pyserial", "环境错误", 16)
     sys.exit()
 
-# --- 协议定义 (与 remote.c 严格对应) ---
-TX_HEADER = 0xA5; TX_TAIL = 0x5A
-RX_HEADER = 0x55; RX_TAIL = 0xAA
+# --- 协议定义 (与 remote.c 严格对应，见 telemetry.py) ---
+from telemetry import SessionRecorder, decode_bulk, pack_frame, pack_control, pack_settings, SP_FAST
+from analytics import LapAnalytics
+from alerts import AlertEngine, load_rules
+from link import BAUD_RATES, BAUD_AUTO, PARITY_LABELS, auto_detect
+from frame_bus import FrameBus, EventDeriver, SYNC, QUEUED, LATEST, T_FRAME, T_STATE, T_STATION, T_AEB, T_LINK, T_RTT
+from latency_probe import LatencyProbe, fmt_stats
+from rt_sched import DeadlineTimer, LatenessHist, tune_current_thread
 
 # --- [UI 视觉核心：深空幽蓝 V10.0 (全中文特供版)] ---
 C_BG_MAIN   = "#020406"   # 更深邃的黑
@@ -42,49 +47,140 @@ F_H2 = ("Microsoft YaHei", 10, "bold")
 F_TXT = ("Microsoft YaHei", 9)
 F_NUM = ("Impact", 24) # 数字保持 Impact 以获得仪表感
 
+# 雷达扫描渲染方式：True = 每个相位预渲染一组隐藏图元，逐帧切换 state (2 次调用)；
+#                   False = 单组图元，逐帧按查找表改写坐标 (6 次调用，图元更少)
+RADAR_PRERENDER = True
+
+LOG_MAX_LINES = 500   # 黑匣子日志框保留行数
+
+BUS_PUMP_MS = 20      # 主线程取总线积压的节拍 (ms)
+STATS_QUEUE = 4096    # 统计/告警订阅的队列上限 (帧)，满时丢最旧
+
+# 链路读写线程 (loop) 调度；低抖动模式见 rt_sched.py：绑核 + SCHED_FIFO (无权限时提高 nice) +
+# 绝对截止时刻休眠 + 缩短 GIL 切换间隔。仅 Linux 完整生效，其他平台自动降级
+IO_PERIOD = 0.05      # 读写周期 (秒)
+LOW_JITTER_IO = False # 默认关闭，可用命令行 --low-jitter 开启
+IO_CPU = None         # 绑定的 CPU 编号 (None = 不绑核)
+IO_FIFO_PRIO = 10     # SCHED_FIFO 优先级 (0 = 不申请)
+IO_SWITCH_MS = 1.0    # 低抖动模式的 GIL 切换间隔 (ms，0 = 不改动)；进程级设置，读写线程退出时恢复原值
+
+# =================================================================
+# [显示文本] 遥测值 -> 显示字符串/颜色，启动时一次算好，刷新时只查表
+# =================================================================
+
+ST_TXT_MAP = {0:"系统待机", 1:"正在巡航", 2:"紧急避障", 3:"站点停靠"}
+DR_TXT_MAP = {0:"停止", 1:"全速前进", 2:"正在倒车", 3:"左旋机动", 4:"右旋机动"}
+
+def render_state(st, dr, sp):
+    """ (st, dr, sp) -> (状态文字, 状态颜色, 姿态文字) """
+    st_txt = ST_TXT_MAP.get(st, "未知状态")
+    col_st = C_TEXT_W
+    if st == 1: col_st = C_GREEN
+    elif st == 2:
+        st_txt = "主动刹车(AEB)" # 对应 remote.c 的 logic
+        col_st = C_RED
+    elif st == 3: col_st = C_ORANGE
+
+    # 【修改点 C】：显示速度状态 (快/慢/静止)
+    # 根据协议，sp=1 为高速，sp=0 为低速
+    if dr == 0 or st in [0, 3]: # 停止或停靠状态
+        sp_text = " (静止)"
+    else:
+        sp_text = " (快)" if sp == 1 else " (慢)"
+    return st_txt, col_st, f"{DR_TXT_MAP.get(dr, '--')}{sp_text}" # 例如 "全速前进 (快)"
+
+STATE_TEXT = {(st, dr, sp): render_state(st, dr, sp) for st in range(4) for dr in range(5) for sp in range(2)}
+NUM_TEXT = [str(k) for k in range(256)]              # 单字节计数/距离
+DWELL_TEXT = [f"停靠中 {k}s" for k in range(256)]    # st=3 时 dat 为倒计时秒数
+
 # =================================================================
 # [组件库] 动态渲染引擎
 # =================================================================
 
+class UiBinder:
+    """ [组件] 差值刷新层：按控件/图元缓存上次写入的属性，只把真正变化的部分交给 Tk """
+    def __init__(self):
+        self.cache = {}
+        self.calls = 0      # 实际发出的 config/itemconfig 次数
+        self.skipped = 0    # 因值未变而省掉的次数
+        self.frames = 0     # 刷新的遥测帧数 (由 update_ui 计)
+
+    def _diff(self, key, kw):
+        last = self.cache.get(key)
+        if last is None: last = self.cache[key] = {}
+        diff = None
+        for k, v in kw.items():
+            if k not in last or last[k] != v:
+                if diff is None: diff = {}
+                diff[k] = last[k] = v
+        if diff is None: self.skipped += 1
+        else: self.calls += 1
+        return diff
+
+    def config(self, w, **kw):
+        d = self._diff(w, kw)
+        if d: w.config(**d)
+
+    def itemconfig(self, cv, item, **kw):
+        d = self._diff((cv, item), kw)
+        if d: cv.itemconfig(item, **d)
+
+    def forget(self, w):
+        """ 控件/画布销毁时调用：丢弃其自身及其全部图元的缓存，不再持有失效的键 """
+        for k in [k for k in self.cache if k is w or (type(k) is tuple and k[0] is w)]: del self.cache[k]
+
+    def stats(self):
+        n = self.frames
+        return {"calls": self.calls, "skipped": self.skipped, "frames": n,
+                "calls_per_frame": self.calls / n if n else 0.0}
+
+ui_bind = UiBinder()   # 全局共用：组件与主界面的 Tk 调用计入同一指标
+
 class CyberButton(tk.Canvas):
-    """ [组件] 带有光效交互的战术按钮 """
+    """ [组件] 带有光效交互的战术按钮 (每种状态的图元只创建一次，交互时只切换显隐) """
+    STATES = ("normal", "hover", "click")
+
     def __init__(self, parent, text, command, w=120, h=35, col=C_CYAN):
         super().__init__(parent, width=w, height=h, bg=C_BG_PANEL, highlightthickness=0)
         self.command = command
         self.text = text
         self.col = col
         self.w, self.h = w, h
+        self.cur = None
         
         self.bind("<Enter>", self.on_enter)
         self.bind("<Leave>", self.on_leave)
         self.bind("<Button-1>", self.on_click)
         self.bind("<ButtonRelease-1>", self.on_release)
         
+        self.build()
         self.draw_state("normal")
 
-    def draw_state(self, state):
-        self.delete("all")
+    def style(self, state):
+        """ 状态 -> (填充, 边框, 文字色, 线宽) """
+        if state == "hover": return "#1c2533", self.col, "#ffffff", 2
+        if state == "click": return self.col, "#ffffff", "#000000", 1
+        return C_BG_PANEL, self.col, self.col, 1
+
+    def build(self):
         w, h = self.w, self.h
         cut = 8 
-        
-        fill_c, outline_c, text_c, width_l = C_BG_PANEL, self.col, self.col, 1
-        
-        if state == "hover":
-            fill_c = "#1c2533"
-            text_c = "#ffffff"
-            width_l = 2
-            # 悬停时的科技线条装饰
-            self.create_line(0, h, cut, h-cut, fill=text_c, width=1)
-            self.create_line(w, 0, w-cut, cut, fill=text_c, width=1)
-            
-        elif state == "click":
-            fill_c = self.col
-            text_c = "#000000"
-            outline_c = "#ffffff"
-        
         pts = [cut,0, w,0, w,h-cut, w-cut,h, 0,h, 0,cut]
-        self.create_polygon(pts, fill=fill_c, outline=outline_c, width=width_l)
-        self.create_text(w/2, h/2, text=self.text, fill=text_c, font=("Microsoft YaHei", 10, "bold"))
+        for s in self.STATES:
+            fill_c, outline_c, text_c, width_l = self.style(s)
+            if s == "hover":
+                # 悬停时的科技线条装饰
+                self.create_line(0, h, cut, h-cut, fill=text_c, width=1, tags=(s, f"{s}.deco"), state="hidden")
+                self.create_line(w, 0, w-cut, cut, fill=text_c, width=1, tags=(s, f"{s}.deco"), state="hidden")
+            self.create_polygon(pts, fill=fill_c, outline=outline_c, width=width_l, tags=(s, f"{s}.poly"), state="hidden")
+            self.create_text(w/2, h/2, text=self.text, fill=text_c, font=("Microsoft YaHei", 10, "bold"),
+                             tags=(s, f"{s}.text", "label"), state="hidden")
+
+    def draw_state(self, state):
+        if state == self.cur: return
+        if self.cur: self.itemconfig(self.cur, state="hidden")
+        self.itemconfig(state, state="normal")
+        self.cur = state
 
     def on_enter(self, e): self.draw_state("hover")
     def on_leave(self, e): self.draw_state("normal")
@@ -94,12 +190,21 @@ class CyberButton(tk.Canvas):
         if self.command: self.command()
         
     def set_config(self, text=None, col=None):
-        if text: self.text = text
-        if col: self.col = col
+        if text and text != self.text:
+            self.text = text
+            self.itemconfig("label", text=text)
+        if col and col != self.col:
+            self.col = col
+            for s in self.STATES:
+                fill_c, outline_c, text_c, _ = self.style(s)
+                self.itemconfig(f"{s}.poly", fill=fill_c, outline=outline_c)
+                self.itemconfig(f"{s}.text", fill=text_c)
         self.draw_state("normal")
 
 class ActiveTechFrame(tk.Frame):
     """ [组件] 带有流光动效边框的容器 """
+    _scan_luts = {}   # (w, h) -> 流光坐标查找表，同尺寸容器共用
+
     def __init__(self, parent, title, w, h):
         super().__init__(parent, bg=C_BG_MAIN, width=w, height=h)
         self.pack_propagate(False) 
@@ -123,18 +228,21 @@ class ActiveTechFrame(tk.Frame):
         self.cv.create_rectangle(15, 0, 15 + title_w, 20, fill=C_BG_MAIN, outline="")
         self.cv.create_text(20, 10, text=f"▎{title}", fill=C_CYAN, anchor="w", font=F_H2)
         
-        # 动态光标
+        # 动态光标 (坐标按相位预先算好，每帧只查表)
         self.scanner_pos = 0
+        self.scanner_vis = True
         self.scanner = self.cv.create_line(0, 0, 0, 0, fill=C_CYAN, width=2)
+        self.scan_lut = self.build_scan_lut(w, h)
         
         self.inner = tk.Frame(self, bg=C_BG_PANEL)
         self.inner.place(x=5, y=25, width=w-10, height=h-30)
 
-    def update_anim(self):
-        w, h = self.w-4, self.h-14 
+    @classmethod
+    def build_scan_lut(cls, fw, fh):
+        """ 流光一整圈的逐相位坐标；跨越拐角的相位记为 None (隐藏) """
+        if (fw, fh) in cls._scan_luts: return cls._scan_luts[(fw, fh)]
+        w, h = fw-4, fh-14 
         total_len = 2 * (w + h)
-        p = self.scanner_pos
-        
         head_len = 50 
         
         def get_coord(dist):
@@ -144,27 +252,46 @@ class ActiveTechFrame(tk.Frame):
             elif dist < 2*w + h: return (2 + w - (dist-w-h), 12 + h) 
             else: return (2, 12 + h - (dist-2*w-h)) 
 
-        pt1 = get_coord(p)
-        pt2 = get_coord(p + head_len)
-        
-        if (pt1[0]==pt2[0] or pt1[1]==pt2[1]):
-            self.cv.coords(self.scanner, pt1[0], pt1[1], pt2[0], pt2[1])
-            self.cv.itemconfig(self.scanner, state="normal")
-        else:
-            self.cv.itemconfig(self.scanner, state="hidden")
+        lut = []
+        p = 0
+        while True:
+            pt1 = get_coord(p)
+            pt2 = get_coord(p + head_len)
+            lut.append(pt1 + pt2 if (pt1[0]==pt2[0] or pt1[1]==pt2[1]) else None)
+            p = (p + 4) % total_len
+            if p == 0: break
+        cls._scan_luts[(fw, fh)] = lut
+        return lut
+
+    def update_anim(self):
+        pts = self.scan_lut[self.scanner_pos]
+        if pts:
+            self.cv.coords(self.scanner, *pts)
+            if not self.scanner_vis:
+                self.cv.itemconfig(self.scanner, state="normal"); self.scanner_vis = True
+        elif self.scanner_vis:
+            self.cv.itemconfig(self.scanner, state="hidden"); self.scanner_vis = False
             
-        self.scanner_pos = (self.scanner_pos + 4) % total_len 
+        self.scanner_pos = (self.scanner_pos + 1) % len(self.scan_lut)
 
 class RingGauge(tk.Canvas):
-    """ [组件] 动态涡轮仪表盘 """
-    def __init__(self, parent, w, h, title, unit, max_val=100, color=C_CYAN):
+    """ [组件] 动态涡轮仪表盘
+        alerts: ((告警位, 颜色), ...) 按优先级排列；每种颜色预建一条数值弧，告警级别变化时只切换显隐 """
+    def __init__(self, parent, w, h, title, unit, max_val=100, color=C_CYAN, alerts=()):
         super().__init__(parent, width=w, height=h, bg=C_BG_PANEL, highlightthickness=0)
         self.w, self.h = w, h
         self.title = title; self.unit = unit
         self.max_val = max_val; self.color = color
+        self.alert_bits = tuple(b for b, _ in alerts)
+        self.alert_cols = tuple(c for _, c in alerts)
         self.rot_angle = 0 
+        # 单字节读数 -> 圆弧角度 (整度即可，避免每个新读数都重画圆弧)
+        self.ext_lut = [self.extent_of(v) for v in range(256)]
         self.draw_base()
 
+    def extent_of(self, val):
+        return -round(max(0, min(val, self.max_val)) / self.max_val * 270)
+
     def draw_base(self):
         cx, cy = self.w/2, self.h/2
         r = min(cx, cy) - 10
@@ -178,21 +305,29 @@ class RingGauge(tk.Canvas):
         self.id_val = self.create_text(cx, cy-5, text="0", fill=C_TEXT_W, font=F_NUM)
         self.create_text(cx, cy-32, text=self.unit, fill=C_TEXT_G, font=("Arial", 9))
         
-        self.id_arc = self.create_arc(cx-r, cy-r, cx+r, cy+r, start=225, extent=0, style="arc", outline=self.color, width=8)
-
-    def set_value(self, val):
-        disp_val = max(0, min(val, self.max_val))
-        extent = -(disp_val / self.max_val) * 270 
-        self.itemconfig(self.id_arc, extent=extent)
-        self.itemconfig(self.id_val, text=str(int(val)))
-        
-        col = self.color
-        # 距离报警变色逻辑
-        if "距离" in self.title:
-            if val < 20: col = C_RED
-            elif val < 40: col = C_ORANGE
-            else: col = C_CYAN
-        self.itemconfig(self.id_arc, outline=col)
+        # 数值弧：[本色, 告警色1, 告警色2, ...]，同一时刻只显示一条
+        self.arcs = [self.create_arc(cx-r, cy-r, cx+r, cy+r, start=225, extent=0, style="arc", outline=c, width=8,
+                                     state="normal" if k == 0 else "hidden")
+                     for k, c in enumerate((self.color,) + self.alert_cols)]
+        self.id_arc = self.arcs[0]
+
+    def set_value(self, val, alert=0):
+        # 报警变色由告警引擎决定：取第一个命中的告警位 (构造时配置)
+        arc = self.arcs[0]
+        if alert:
+            for k, bit in enumerate(self.alert_bits, 1):
+                if alert & bit: arc = self.arcs[k]; break
+        if arc != self.id_arc:
+            # 显隐切换同样经差值刷新层，计入每帧 Tk 调用数
+            ui_bind.itemconfig(self, self.id_arc, state="hidden"); ui_bind.itemconfig(self, arc, state="normal")
+            self.id_arc = arc
+        v = int(val)
+        if 0 <= v < 256:
+            ui_bind.itemconfig(self, arc, extent=self.ext_lut[v])
+            ui_bind.itemconfig(self, self.id_val, text=NUM_TEXT[v])
+        else:
+            ui_bind.itemconfig(self, arc, extent=self.extent_of(val))
+            ui_bind.itemconfig(self, self.id_val, text=str(v))
         
     def animate_spin(self):
         self.rot_angle = (self.rot_angle - 5) % 360
@@ -202,8 +337,9 @@ class RingGauge(tk.Canvas):
 # 主程序逻辑
 # =================================================================
 class FinalSystem:
-    def __init__(self, root):
+    def __init__(self, root, low_jitter=LOW_JITTER_IO, io_cpu=IO_CPU, io_fifo=IO_FIFO_PRIO, io_switch_ms=IO_SWITCH_MS):
         self.root = root
+        self.low_jitter = low_jitter; self.io_cpu = io_cpu; self.io_fifo = io_fifo; self.io_switch_ms = io_switch_ms
         self.root.title("STM32 循迹小车 张智棋 倪蕴杰 周佑城")
         
         sw, sh = self.root.winfo_screenwidth(), self.root.winfo_screenheight()
@@ -216,6 +352,7 @@ class FinalSystem:
         
         # 核心变量
         self.ser = None; self.conn = False; self.run = True
+        self.detecting = False
         self.mode = 0; self.joy_x = 0; self.joy_y = 0
 
         # --- [手柄] Xbox/通用手柄支持：左摇杆接管虚拟摇杆（仅手动模式生效） ---
@@ -235,14 +372,59 @@ class FinalSystem:
             self.gamepad = None
             self._gamepad_init_msg = f"手柄初始化失败: {e}"
 
-        # 【核心修改点 1】初始化站点记录变量，防止重复记录同一站
-        self.last_log_sta = -1
+        # 会话记录 + 圈速/站点统计 (连接期间自动录制到 sessions/)
+        self.recorder = None
+        self.analytics = LapAnalytics()
+        self.stats_win = None; self.stats_after = None
+
+        # 告警规则引擎 (默认规则见 alerts.py，可用 alert_rules.json 覆盖)
+        self._alert_init_msg = None
+        try:
+            self.alerts = AlertEngine(load_rules(), on_event=self.on_alert)
+        except (OSError, ValueError) as e:
+            self.alerts = AlertEngine(on_event=self.on_alert)
+            self._alert_init_msg = f"告警规则加载失败，已使用默认规则: {e}"
+        self.al_danger = self.alerts.bit("dist_danger")
+        self.al_warn = self.alerts.bit("dist_warn")
+        self.al_caution = self.alerts.bit("dist_caution")
+        self.al_aeb = self.alerts.bit("aeb")
+
+        # 遥测总线：读线程只 publish 解码帧，消费者各自选择投递策略 (见 frame_bus.py)
+        #   记录器       SYNC   读线程内直接缓冲写盘
+        #   统计/告警    QUEUED 每帧都要处理 (含距离波形历史)，积压过多时丢最旧
+        #   仪表显示     LATEST 只画最新一帧
+        # 到站/状态切换/AEB 由 EventDeriver 派生，站点日志不再混在解码循环里
+        self.bus = FrameBus(on_error=self.on_bus_error)
+        self.events = EventDeriver(self.bus)
+        self.bus.subscribe(T_FRAME, self.rec_frame, SYNC, name="记录器")
+        self.bus.subscribe(T_STATE, self.rec_state, SYNC, name="记录器/状态")
+        self.bus.subscribe(T_AEB, self.rec_aeb, SYNC, name="记录器/AEB")
+        self.bus.subscribe(T_LINK, self.rec_link, SYNC, name="记录器/链路")
+        self.bus.subscribe(T_RTT, self.rec_rtt, SYNC, name="记录器/RTT")
+        self.sub_stats = self.bus.subscribe(T_FRAME, self.feed_stats, QUEUED, STATS_QUEUE, "统计/告警")
+        self.sub_station = self.bus.subscribe(T_STATION, self.on_station, QUEUED, 64, "到站日志")
+        self.sub_view = self.bus.subscribe(T_FRAME, self.update_ui, LATEST, name="仪表显示")
+        self.sub_rtt = self.bus.subscribe(T_RTT, self.show_rtt, LATEST, name="RTT 显示")
+
+        # 往返延迟探针 (读写线程内使用，见 latency_probe.py)
+        # 默认只用摇杆方向法被动测量；0xC5 探针帧需固件支持回显，由“回显探针”按钮显式开启
+        self.probe = LatencyProbe()
+        # 探针状态只在读写线程内修改；主线程的开关/复位排队 (deque 的 append/popleft 线程安全)，由 io_loop 每拍应用
+        self.probe_ops = deque(); self.probe_echo = False
+        self.io_hist = LatenessHist()   # 读写线程唤醒迟滞 (两种调度模式都统计，便于对比)
         
+        # 差值刷新层 (update_ui 只在值变化时调用 Tk)
+        self.ui = ui_bind
+
         # 动画变量
-        self.radar_angle = 0; self.radar_dir = 2 
+        self.radar_phase = 0; self.anim_tick = 0
         self.dist_history = [0]*100 # 增加历史记录长度以获得更平滑的波形
+        self.wave_dirty = True
         self.anim_frames = [] 
         self.current_distance = 0
+        self.ping_vis = False
+        # 低功耗模式：冻结全部装饰动画，只保留数据驱动的刷新
+        self.low_power = False
         
         # --- [背景视觉对象] ---
         self.bg_stars = []    
@@ -265,6 +447,8 @@ class FinalSystem:
         # UI 已就绪，现在可以安全写日志
         if self._gamepad_init_msg:
             self.log_sys(self._gamepad_init_msg)
+        if self._alert_init_msg:
+            self.log_sys(self._alert_init_msg)
 
         # === 构建雷达副屏 ===
         self.radar_win = tk.Toplevel(self.root)
@@ -274,9 +458,13 @@ class FinalSystem:
         self.radar_win.resizable(False, False)
         self.radar_win.protocol("WM_DELETE_WINDOW", lambda: None)
         self.setup_radar_ui(w2, h2)
+        # 副屏存活标记，update_ui / animate_visuals 不必每帧 winfo_exists()
+        self.radar_alive = True
+        self.radar_win.bind("<Destroy>", self.on_radar_close)
         
         # 启动
         self.animate_visuals() 
+        self.pump_bus()
         self.t = threading.Thread(target=self.loop, daemon=True)
         self.t.start()
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
@@ -286,6 +474,7 @@ class FinalSystem:
 
     def init_bg_visuals(self, w, h):
         # 1. 静态星尘
+        self.star_lit = set()
         for _ in range(80):
             x = random.randint(0, w)
             y = random.randint(0, h)
@@ -294,14 +483,22 @@ class FinalSystem:
             star = self.cv_bg.create_oval(x, y, x+sz, y+sz, fill=col, outline="")
             self.bg_stars.append(star)
 
-        # 2. 动态数据流
-        for _ in range(15):
-            x = random.randint(0, w)
-            y = random.randint(-200, h)
-            length = random.randint(50, 150)
-            spd = random.uniform(2, 6)
-            line = self.cv_bg.create_line(x, y, x, y+length, fill="#001a1a", width=1)
-            self.bg_rain.append([line, spd, length])
+        # 2. 动态数据流：按速度分 3 层，每层一个 tag 整体平移；
+        #    每根雨线在 y 与 y-周期 处各画一份，层偏移满一个周期时整体回跳，画面无缝循环
+        period = h + 210
+        for layer, spd in enumerate((2, 4, 6)):
+            tag = f"rain{layer}"
+            for _ in range(5):
+                x = random.randint(0, w)
+                y = random.randint(-200, h)
+                length = random.randint(50, 150)
+                for y0 in (y, y - period):
+                    self.cv_bg.create_line(x, y0, x, y0+length, fill="#001a1a", width=1, tags=tag)
+            n = period // spd
+            self.bg_rain.append((tag, [spd]*(n-1) + [spd - period]))
+
+        # 3. 状态灯呼吸色 (约 2.1s 一个周期)
+        self.pulse_lut = [f"#00{int(155 + 100 * math.sin(k * 0.03 * 3)):02x}00" for k in range(70)]
 
     # =================================================================
     # 主界面布局
@@ -314,6 +511,10 @@ class FinalSystem:
         tk.Label(top, text="STM32 智能车载监控终端", font=("Microsoft YaHei", 18, "bold"), fg=C_CYAN, bg=C_BG_PANEL).pack(side=tk.LEFT, padx=20)
         self.lbl_status = tk.Label(top, text="链路状态：断开", font=F_H2, fg=C_TEXT_G, bg=C_BG_PANEL)
         self.lbl_status.pack(side=tk.RIGHT, padx=20)
+        self.btn_lp = CyberButton(top, "低功耗：关", self.toggle_low_power, w=110, h=30, col=C_TEXT_G)
+        self.btn_lp.pack(side=tk.RIGHT, padx=5)
+        self.btn_probe = CyberButton(top, "回显探针：关", self.toggle_probe_echo, w=120, h=30, col=C_TEXT_G)
+        self.btn_probe.pack(side=tk.RIGHT, padx=5)
         # 装饰线
         tk.Canvas(self.root, width=1060, height=2, bg=C_CYAN_DIM, highlightthickness=0).place(x=20, y=60)
 
@@ -332,7 +533,8 @@ class FinalSystem:
         
         # 2. 第一行：波特率 & 数据位
         self.mk_label(self.f_comm.inner, "速率 (BAUD)", 10, 55, col=C_TEXT_HL)
-        self.cb_baud = ttk.Combobox(self.f_comm.inner, values=["9600", "115200"], state="readonly")
+        # 可直接输入自定义波特率；选择“自动检测”时连接前先扫描候选组合
+        self.cb_baud = ttk.Combobox(self.f_comm.inner, values=BAUD_RATES + [BAUD_AUTO])
         self.cb_baud.current(0)
         self.cb_baud.place(x=10, y=75, width=140)
 
@@ -362,8 +564,10 @@ class FinalSystem:
         self.anim_frames.append(self.f_conf)
         self.mk_label(self.f_conf.inner, "巡航速度 (%)", 10, 10)
         self.sc_spd = tk.Scale(self.f_conf.inner, from_=0, to=100, orient=tk.HORIZONTAL, bg=C_BG_PANEL, fg=C_CYAN, 
-                                highlightthickness=0, activebackground=C_CYAN, troughcolor="#000", length=280)
+                                highlightthickness=0, activebackground=C_CYAN, troughcolor="#000", length=280,
+                                command=self.on_spd)
         self.sc_spd.set(60); self.sc_spd.place(x=10, y=35)
+        self.spd_set = 60   # 滑块值缓存，update_ui 不必每帧 Scale.get()
         self.mk_label(self.f_conf.inner, "站点停留时长 (秒)", 10, 75)
         self.ent_tim = tk.Entry(self.f_conf.inner, bg="#000", fg="white", insertbackground="white", relief="flat", font=("Consolas", 12))
         self.ent_tim.insert(0, "10"); self.ent_tim.place(x=10, y=100, width=60)
@@ -381,13 +585,16 @@ class FinalSystem:
         self.gauge_spd.place(x=15, y=10); self.anim_frames.append(self.gauge_spd)
         
         # 距离表量程调整为 250cm
-        self.gauge_dist = RingGauge(self.f_dash.inner, 140, 140, "前方障距", "cm", 250, C_ORANGE)
+        # 告警变色在构造时按告警规则位配置 (危险红 > 警告橙 > 本色青)
+        self.gauge_dist = RingGauge(self.f_dash.inner, 140, 140, "前方障距", "cm", 250, C_CYAN,
+                                    alerts=((self.al_danger, C_RED), (self.al_warn, C_ORANGE)))
         self.gauge_dist.place(x=170, y=10); self.anim_frames.append(self.gauge_dist)
         
         self.mk_card(self.f_dash.inner, 15, 160, "当前模式", "待机", "val_st")
         # 【修改点 B】: 显示运动状态和速度 (快/慢/静止)
         self.mk_card(self.f_dash.inner, 170, 160, "运动姿态", "--", "val_dr")
         self.mk_card(self.f_dash.inner, 15, 250, "已停站点", "0", "val_ct")
+        self.mk_card(self.f_dash.inner, 170, 250, "上圈用时", "--", "val_lap")
         
         self.f_dash.inner.update()
         cv = tk.Canvas(self.f_dash.inner, bg="#080c10", height=200, width=300, highlightthickness=1, highlightbackground="#161b22")
@@ -420,6 +627,10 @@ class FinalSystem:
                         font=("Consolas", 8))
 
         self.scan_bar = self.cv_wave.create_line(0, 0, 0, 200, fill=C_CYAN_DIM, width=2)
+
+        # 链路往返延迟 (滚动百分位)
+        self.lbl_rtt = tk.Label(self.f_dash.inner, text="RTT: 等待样本...", fg=C_TEXT_G, bg=C_BG_PANEL, font=F_TXT, anchor="w")
+        self.lbl_rtt.place(x=15, y=570, width=300)
         self.wave_line = self.cv_wave.create_line(0,0,0,0, fill=C_CYAN, width=2)
 
         # --- 右列 ---
@@ -466,6 +677,7 @@ class FinalSystem:
         self.cv_joy.bind("<ButtonRelease-1>", self.joy_reset)
         self.cv_joy.bind("<Button-1>", self.joy_move)
         tk.Label(self.f_ctrl.inner, text="提示：仅在手动模式下可用", fg=C_TEXT_G, bg=C_BG_PANEL, font=F_TXT).place(x=80, y=400)
+        CyberButton(self.f_ctrl.inner, "站点统计面板", self.open_stats, w=260, col=C_CYAN).place(x=30, y=450)
 
     # --- 雷达副屏 ---
     def setup_radar_ui(self, w, h):
@@ -486,12 +698,30 @@ class FinalSystem:
         self.rcv.create_line(cx, cy, cx+300, cy, fill="#0f1f0f", dash=(4,4))
         self.rcv.create_line(cx, cy, cx, cy-300, fill="#0f1f0f", dash=(4,4))
         
-        self.radar_sectors = []
-        for _ in range(5): 
-            s = self.rcv.create_arc(cx-300, cy-300, cx+300, cy+300, start=90, extent=15, fill="", outline="", style="pieslice")
-            self.radar_sectors.append(s)
-            
-        self.scan_line = self.rcv.create_line(cx, cy, cx, cy-300, fill=C_CYAN, width=3)
+        # 扫描一个往返周期的相位表：(扫描线终点, 5 个拖影扇区起始角)
+        cols = [C_CYAN, "#00a0a0", "#007070", "#004040", "#002020"]
+        sweep = [(a, 1) for a in range(0, 181, 3)] + [(a, -1) for a in range(177, 0, -3)]
+        self.radar_lut = []
+        for a, d in sweep:
+            rad = math.radians(180 - a)
+            self.radar_lut.append(((cx, cy, cx+300*math.cos(rad), cy-300*math.sin(rad)),
+                                   tuple(180 - a + i*2*d for i in range(5))))
+
+        if RADAR_PRERENDER:
+            # 每个相位预先画好一组隐藏的扇区+扫描线，逐帧只切换两组的 state
+            for k, (line, starts) in enumerate(self.radar_lut):
+                tag = f"sweep{k}"
+                for i, st in enumerate(starts):
+                    self.rcv.create_arc(cx-300, cy-300, cx+300, cy+300, start=st, extent=3, fill=cols[i],
+                                        outline="", style="pieslice", state="hidden", tags=tag)
+                self.rcv.create_line(*line, fill=C_CYAN, width=3, state="hidden", tags=tag)
+            self.rcv.itemconfig("sweep0", state="normal")
+        else:
+            self.radar_sectors = []
+            for i in range(5): 
+                s = self.rcv.create_arc(cx-300, cy-300, cx+300, cy+300, start=90, extent=3, fill=cols[i], outline="", style="pieslice")
+                self.radar_sectors.append(s)
+            self.scan_line = self.rcv.create_line(cx, cy, cx, cy-300, fill=C_CYAN, width=3)
         self.lbl_r_dist = self.rcv.create_text(60, 350, text="---", fill="#333", anchor="w", font=("Impact", 50))
         self.rcv.create_text(60, 400, text="实时距离 (CM)", fill="#555", anchor="w", font=F_TXT)
         self.lbl_r_txt = self.rcv.create_text(w-50, 380, text="无信号", fill="#333", anchor="e", font=("Microsoft YaHei", 18, "bold"))
@@ -499,6 +729,59 @@ class FinalSystem:
         
         self.radar_ping = self.rcv.create_oval(cx, cy, cx, cy, outline=C_GREEN, width=2, state="hidden")
         self.radar_pulse_r = 0
+        self.ping_lut = [(cx-r, cy-r, cx+r, cy+r) for r in range(0, 301, 8)]
+
+    def on_radar_close(self, e):
+        """ 副屏关闭：停止雷达刷新并清理其图元的差值缓存 """
+        if e.widget is not self.radar_win: return
+        self.radar_alive = False; self.ui.forget(self.rcv)
+
+    # --- 站点统计面板 (按需打开) ---
+    def open_stats(self):
+        if self.stats_win and self.stats_win.winfo_exists():
+            self.stats_win.lift(); return
+        win = tk.Toplevel(self.root)
+        win.title("圈速与站点统计")
+        win.geometry("640x400")
+        win.configure(bg=C_BG_MAIN)
+        style = ttk.Style()
+        style.configure('Treeview', background=C_BG_PANEL, fieldbackground=C_BG_PANEL, foreground=C_TEXT_W, rowheight=22)
+        style.configure('Treeview.Heading', background="#111", foreground=C_CYAN)
+
+        cols = ("sta", "cnt", "dw_avg", "dw_last", "seg_avg", "seg_aeb", "seg_min")
+        heads = ("站点", "到站次数", "平均停靠(s)", "上次停靠(s)", "进站区间均时(s)", "区间AEB", "区间最近(cm)")
+        tv = ttk.Treeview(win, columns=cols, show="headings", height=9)
+        for c, t in zip(cols, heads):
+            tv.heading(c, text=t); tv.column(c, width=88, anchor="center")
+        tv.place(x=10, y=10, width=620, height=240)
+        self.lbl_laps = tk.Label(win, text="", fg=C_CYAN, bg=C_BG_MAIN, font=F_TXT, anchor="w", justify="left")
+        self.lbl_laps.place(x=10, y=260, width=620, height=130)
+        self.stats_tv = tv
+        self.stats_win = win
+        win.bind("<Destroy>", self.on_stats_close)
+        self.refresh_stats()
+
+    def on_stats_close(self, e):
+        """ 统计窗口关闭：取消待执行的刷新，快速关闭再打开时不会叠加第二条刷新链 """
+        if e.widget is not self.stats_win: return
+        if self.stats_after: self.root.after_cancel(self.stats_after); self.stats_after = None
+
+    def refresh_stats(self):
+        if not (self.stats_win and self.stats_win.winfo_exists()): return
+        def f(v): return "--" if v is None else f"{v:.1f}"
+        tv = self.stats_tv
+        tv.delete(*tv.get_children())
+        for s, cnt, dw_avg, dw_last, seg_avg, aeb, seg_min in self.analytics.summary_rows():
+            tv.insert("", tk.END, values=(f"第{s}站", cnt, f(dw_avg), f(dw_last), f(seg_avg), aeb,
+                                          "--" if seg_min is None else seg_min))
+        ls = self.analytics.lap_stat
+        self.lbl_laps.config(text=f"完整圈数: {ls.n}    上圈: {f(ls.last)}s    最快: {f(ls.min)}s    平均: {f(ls.mean)}s\n"
+                                  f"AEB 累计: {self.analytics.aeb_total} 次    已处理帧: {self.analytics.frames}\n"
+                                  + "    ".join(f"{m['name']}: 积压 {m['depth']} 丢弃 {m['dropped']} 延迟 {m['lag_avg_ms']:.1f}ms"
+                                             for m in self.bus.metrics())
+                                  + f"\n界面刷新: {self.ui.stats()['calls_per_frame']:.2f} 次 Tk 调用/帧 (值未变省略 {self.ui.skipped} 次)"
+                                  + f"\n读写线程唤醒迟滞{'(低抖动)' if self.low_jitter else ''}: {self.io_hist.summary()}")
+        self.stats_after = self.root.after(500, self.refresh_stats)
 
     # 【修改】mk_label 增加可选颜色参数，默认为 C_TEXT_G
     def mk_label(self, p, t, x, y, col=C_TEXT_G): 
@@ -514,26 +797,26 @@ class FinalSystem:
         setattr(self, tag_name, l)
 
     # --- 核心动画循环 ---
+    # 周期性装饰动画全部按相位查表，每帧 Tk 调用数为小常数
     def animate_visuals(self):
         if not self.run: return
+        if self.low_power:
+            self.draw_wave()
+            self.root.after(200, self.animate_visuals)
+            return
+        k = self.anim_tick = self.anim_tick + 1
         
-        # 1. 更新数据流雨 (Cyber Rain)
-        h_max = 750
-        for drop in self.bg_rain:
-            self.cv_bg.move(drop[0], 0, drop[1])
-            pos = self.cv_bg.coords(drop[0])
-            if pos[3] > h_max:
-                new_x = random.randint(0, 1100)
-                new_len = random.randint(50, 150)
-                new_spd = random.uniform(2, 6)
-                self.cv_bg.coords(drop[0], new_x, -new_len, new_x, 0)
-                drop[1] = new_spd
+        # 1. 更新数据流雨 (Cyber Rain)：每层一次 move
+        for tag, lut in self.bg_rain:
+            self.cv_bg.move(tag, 0, lut[k % len(lut)])
 
         # 2. 更新背景星尘
         if random.random() < 0.1:
             star_id = random.choice(self.bg_stars)
-            cur_col = self.cv_bg.itemcget(star_id, "fill")
-            new_col = "#004455" if cur_col == "#0d1a26" else "#0d1a26"
+            if star_id in self.star_lit:
+                self.star_lit.discard(star_id); new_col = "#0d1a26"
+            else:
+                self.star_lit.add(star_id); new_col = "#004455"
             self.cv_bg.itemconfig(star_id, fill=new_col)
         
         # 3. 组件流光
@@ -541,46 +824,46 @@ class FinalSystem:
             if hasattr(f, 'update_anim'): f.update_anim()
             if hasattr(f, 'animate_spin'): f.animate_spin()
 
-        # 4. 雷达扫描动画
-        step = 3
-        self.radar_angle += step * self.radar_dir
-        if self.radar_angle >= 180: self.radar_angle = 180; self.radar_dir = -1
-        elif self.radar_angle <= 0: self.radar_angle = 0; self.radar_dir = 1
-
-        if self.radar_win.winfo_exists():
-            cx, cy = 325, 350
-            angle = 180 - self.radar_angle
-            cols = [C_CYAN, "#00a0a0", "#007070", "#004040", "#002020"]
-            for i, sec in enumerate(self.radar_sectors):
-                lag = i * 2 * self.radar_dir 
-                start_ang = angle + lag
-                self.rcv.itemconfigure(sec, start=start_ang, extent=3, fill=cols[i])
-                
-            rad = math.radians(angle)
-            self.rcv.coords(self.scan_line, cx, cy, cx+300*math.cos(rad), cy-300*math.sin(rad))
+        # 4. 雷达扫描动画 (副屏关闭后由 <Destroy> 置 radar_alive，不必每帧 winfo_exists)
+        if self.radar_alive:
+            prev = self.radar_phase
+            ph = self.radar_phase = (prev + 1) % len(self.radar_lut)
+            if RADAR_PRERENDER:
+                self.rcv.itemconfig(f"sweep{prev}", state="hidden")
+                self.rcv.itemconfig(f"sweep{ph}", state="normal")
+            else:
+                line, starts = self.radar_lut[ph]
+                for sec, st in zip(self.radar_sectors, starts):
+                    self.rcv.itemconfigure(sec, start=st)
+                self.rcv.coords(self.scan_line, *line)
             
-            # 雷达波扩散特效
-            self.radar_pulse_r += 8
-            if self.radar_pulse_r > 300: self.radar_pulse_r = 0
-            self.rcv.coords(self.radar_ping, cx-self.radar_pulse_r, cy-self.radar_pulse_r, 
-                            cx+self.radar_pulse_r, cy+self.radar_pulse_r)
+            # 雷达波扩散特效 (跟随告警引擎的距离告警状态，阈值与迟滞由规则文件决定)
+            show = bool(self.alerts.active & (self.al_caution | self.al_warn | self.al_danger))
+            if show:
+                self.radar_pulse_r = (self.radar_pulse_r + 1) % len(self.ping_lut)
+                self.rcv.coords(self.radar_ping, *self.ping_lut[self.radar_pulse_r])
+            if show != self.ping_vis:
+                self.rcv.itemconfig(self.radar_ping, state="normal" if show else "hidden")
+                self.ping_vis = show
+
+        # 5. 波形图光栅 (x: 5, 10 ... 300 循环)
+        self.cv_wave.move(self.scan_bar, -295 if k % 60 == 0 else 5, 0)
+        
+        # 6. 波形多边形绘制 (仅在有新数据时)
+        self.draw_wave()
             
-            # 只有当距离有效且较近时显示扩散波
-            if self.current_distance < 60 and self.current_distance > 0:
-                 self.rcv.itemconfig(self.radar_ping, state="normal")
-            else:
-                 self.rcv.itemconfig(self.radar_ping, state="hidden")
+        if self.conn:
+            self.lbl_status.config(fg=self.pulse_lut[k % len(self.pulse_lut)])
 
-        # 5. 波形图光栅
-        self.cv_wave.move(self.scan_bar, 5, 0)
-        if self.cv_wave.coords(self.scan_bar)[0] > 300:
-            self.cv_wave.move(self.scan_bar, -300, 0)
-        
-        # 6. 波形多边形绘制 (修复爆表问题)
+        self.root.after(30, self.animate_visuals)
+
+    def draw_wave(self):
+        if not self.wave_dirty: return
+        self.wave_dirty = False
         w_graph, h_graph = 300, 200
         max_graph_dist = 250 # 对应 HC-SR04 量程
         
-        pts = [0, h_graph]
+        pts = []
         step_x = w_graph / len(self.dist_history)
         
         for i, d in enumerate(self.dist_history):
@@ -591,16 +874,20 @@ class FinalSystem:
             y = h_graph - (clamped_d / max_graph_dist * h_graph)
             pts.extend([i*step_x, y])
             
-        pts.extend([w_graph, h_graph])
-        if len(pts) > 4:
-            self.cv_wave.coords(self.wave_line, *pts[2:-2])
-            
-        if self.conn:
-            pulse = int(155 + 100 * math.sin(time.time() * 3))
-            hex_c = f"#00{pulse:02x}00"
-            self.lbl_status.config(fg=hex_c)
+        self.cv_wave.coords(self.wave_line, *pts)
 
-        self.root.after(30, self.animate_visuals)
+    def toggle_probe_echo(self):
+        on = self.probe_echo = not self.probe_echo
+        self.probe_ops.append((self.probe.set_echo, on))
+        self.btn_probe.set_config("回显探针：开" if on else "回显探针：关", C_ORANGE if on else C_TEXT_G)
+        self.log_sys("回显探针已开启：定期下发 0xC5 探针帧 (需固件支持回显)" if on
+                     else "回显探针已关闭：仅在手动模式下按摇杆方向变化测量延迟")
+
+    def toggle_low_power(self):
+        self.low_power = not self.low_power
+        self.btn_lp.set_config("低功耗：开" if self.low_power else "低功耗：关",
+                               C_ORANGE if self.low_power else C_TEXT_G)
+        self.log_sys("低功耗模式已开启：装饰动画冻结" if self.low_power else "低功耗模式已关闭")
 
     # --- 逻辑控制 ---
     def refresh(self):
@@ -608,10 +895,14 @@ class FinalSystem:
         except: pass
 
     def toggle(self):
+        # 自动检测线程正在轮流打开该串口：检测结束 (finish_auto_detect) 前不接受手动连接
+        if self.detecting: return
         if not self.conn:
             try:
                 p = self.cb_port.get()
                 if not p: return
+                if self.cb_baud.get() == BAUD_AUTO:
+                    self.start_auto_detect(p); return
                 b = int(self.cb_baud.get())
                 
                 # --- [新增] 读取高级串口参数 ---
@@ -640,16 +931,70 @@ class FinalSystem:
                     timeout=0.05
                 )
                 
+                # 每次连接开启一个新的会话记录
+                self.analytics.reset(); self.events.reset(); self.probe_ops.append((self.probe.reset,))
+                try: self.recorder = SessionRecorder()
+                except OSError as e:
+                    self.recorder = None
+                    self.log_sys(f"会话记录不可用: {e}")
+
                 self.conn = True
                 self.btn_cn.set_config("断开连接", C_RED)
                 self.lbl_status.config(text="链路状态：已连接", fg=C_GREEN)
-                self.log_sys(f"链路建立: {b}bps, {d_bit}数据位, {p_str.split(' ')[0]}校验")
+                info = f"{b}bps, {d_bit}数据位, {p_str.split(' ')[0]}校验"
+                self.log_sys(f"链路建立: {info}")
+                self.bus.publish(T_LINK, True, info, time.time())
             except Exception as e: messagebox.showerror("错误", str(e))
         else:
             self.conn = False; self.ser.close()
             self.btn_cn.set_config("连接设备", C_CYAN)
             self.lbl_status.config(text="链路状态：断开", fg=C_TEXT_G)
             self.log_sys("串口通信链路已断开")
+            self.bus.publish(T_LINK, False, "", time.time())
+            self.close_session()
+
+    def close_session(self):
+        """ 结束会话：补齐统计 (无论是否在记录)；有记录时关闭文件并写出站点索引，供跨会话查询 """
+        rec, self.recorder = self.recorder, None
+        if rec: rec.close()
+        # 先处理完已收到但尚未取出的帧，再与重放 (LapAnalytics.replay) 一样补齐最后一次停靠
+        self.sub_stats.drain()
+        self.analytics.finish()
+        if not rec: return
+        try:
+            self.analytics.save_index(rec.path)
+            self.log_sys(f"会话已保存: {os.path.basename(rec.path)} ({rec.frames} 帧)")
+        except OSError: pass
+
+    # --- 链路参数自动检测 (后台线程，结果回主线程后自动连接) ---
+    def start_auto_detect(self, port):
+        if self.detecting: return
+        self.detecting = True
+        self.btn_cn.set_config("检测中...", C_TEXT_G)
+        self.log_sys("正在自动检测波特率/校验位...")
+
+        def open_port(b, p):
+            return serial.Serial(port=port, baudrate=b, bytesize=8, parity=p,
+                                 stopbits=serial.STOPBITS_ONE, timeout=0.05)
+
+        def work():
+            res = None
+            try: res = auto_detect(open_port, log=lambda m: self.root.after(0, self.log_sys, m))
+            except Exception as e: self.root.after(0, self.log_sys, f"自动检测异常: {e}")
+            finally: self.root.after(0, self.finish_auto_detect, res)
+        threading.Thread(target=work, daemon=True).start()
+
+    def finish_auto_detect(self, res):
+        self.detecting = False
+        self.btn_cn.set_config("连接设备", C_CYAN)
+        if not res:
+            self.log_sys("自动检测失败：所有组合均未收到有效遥测帧")
+            return
+        b, p, _, valid, rate = res
+        self.cb_baud.set(str(b)); self.cb_data.set("8"); self.cb_stop.set("1")
+        self.cb_parity.set(PARITY_LABELS[p])
+        self.log_sys(f"自动检测锁定: {b}bps 校验{p} (合法帧 {valid}, 通过率 {rate:.0%})")
+        self.toggle()
 
     def sw_mode(self):
         self.mode = 1 - self.mode
@@ -667,9 +1012,8 @@ class FinalSystem:
         if not self.conn: return
         try:
             s = int(self.sc_spd.get()); t = int(self.ent_tim.get())
-            # 协议：0xB5, Spd, Tim, 0, Sum, 0x5B
-            chk = (s + t + 0) & 0xFF
-            self.ser.write(struct.pack('BBBBBB', 0xB5, s, t, 0, chk, 0x5B))
+            # 协议：0xB5, Spd, Tim, 0, Sum, 0x5B (见 telemetry.pack_settings)
+            self.ser.write(pack_settings(s, t))
             self.log_sys(f"参数下发: 巡航速度{s}% 驻留时间{t}s")
         except: pass
 
@@ -790,7 +1134,11 @@ class FinalSystem:
     def log_sys(self, msg):
         ts = datetime.datetime.now().strftime("%H:%M:%S")
         self.txt_log.insert(tk.END, f"[{ts}] {msg}\n")
+        # 日志框只保留最近 LOG_MAX_LINES 行，长时间值守时不无限增长 (完整记录在会话事件文件中)
+        if int(self.txt_log.index("end-1c").split(".")[0]) > LOG_MAX_LINES:
+            self.txt_log.delete("1.0", f"end-{LOG_MAX_LINES}l")
         self.txt_log.see(tk.END)
+        self.rec_event(time.time(), "log", msg)
         
         # 【核心修改点 2】如果是站点相关的日志，同步写入到 station_log.txt 文件
         if "站点" in msg:
@@ -810,146 +1158,215 @@ class FinalSystem:
                 # print(f"[失败] 文件写入错误: {e}")
                 pass
 
+    def on_alert(self, t, rule, on):
+        """ 告警引擎事件：写黑匣子日志 + 会话事件 """
+        self.log_sys(f"告警{'触发' if on else '解除'}: {rule.get('msg', rule['name'])}")
+        self.rec_event(t, "alert", f"{rule['name']} {'on' if on else 'off'}")
+
     def on_close(self):
         self.run = False
+        self.t.join(1.0)   # 等读写线程退出 (恢复 GIL 切换间隔、不再写串口)
         if self.ser: self.ser.close()
+        self.close_session()
         self.root.destroy()
         sys.exit()
 
     def loop(self):
+        hist = self.io_hist; timer = None
+        old_si = sys.getswitchinterval()
+        if self.low_jitter:
+            ok, failed = tune_current_thread(self.io_cpu, self.io_fifo, switch_interval=self.io_switch_ms / 1000)
+            self.root.after(0, self.log_sys, "低抖动读写: " + "，".join(ok) + (f" | 未生效: {'，'.join(failed)}" if failed else ""))
+            timer = DeadlineTimer(IO_PERIOD, hist)
+        try: self.io_loop(hist, timer)
+        finally: sys.setswitchinterval(old_si)   # GIL 切换间隔是进程级的，读写线程退出后不再影响界面线程
+
+    def io_loop(self, hist, timer):
         buf = b''
+        t_ctl = 0.0; t_last_rx = None
+        # 每拍持 GIL 的工作只有：收发、批量解码、发布 (同步订阅者仅缓冲写盘/派生事件)，其余都在主线程
         while self.run:
             self.poll_gamepad()
+            while self.probe_ops:
+                fn, *a = self.probe_ops.popleft(); fn(*a)
             if self.conn and self.ser:
                 try:
-                    # 发送控制指令 (每100ms或操作时)
-                    if self.mode or time.time()%0.1 < 0.02:
-                        chk = (self.joy_x & 0xFF) + (self.joy_y & 0xFF) + (self.mode & 0xFF)
-                        self.ser.write(struct.pack('BbbBBB', TX_HEADER, self.joy_x, self.joy_y, self.mode, chk & 0xFF, TX_TAIL))
+                    # 发送控制指令 (每100ms或操作时)；按间隔判断，绝对时刻调度下相位固定也不会漏发
+                    probe = self.probe
+                    now = time.monotonic()
+                    if self.mode or now >= t_ctl:
+                        t_ctl = now + 0.1
+                        self.ser.write(pack_control(self.joy_x, self.joy_y, self.mode))
+                        probe.on_control(time.perf_counter(), self.joy_x, self.joy_y, self.mode)
+                    # 延迟探针帧 (仅在开启回显探针时产生)
+                    pkt = probe.due(time.perf_counter())
+                    if pkt: self.ser.write(pkt)
                     
                     if self.ser.in_waiting: buf += self.ser.read(self.ser.in_waiting)
                     
                     # 协议解析: 55 [State] [Dir] [Spd] [Sta] [Data] [Sum] AA
-                    while len(buf) >= 8:
-                        if buf[0]!=0x55 or buf[7]!=0xAA: 
-                            buf=buf[1:]
-                            continue
-                            
-                        st, dr, sp, sta, dat, chk = struct.unpack('BBBBBB', buf[1:7])
-                        
-                        # 校验和检查
-                        if (st+dr+sp+sta+dat)&0xFF == chk:
-                            self.root.after(0, self.update_ui, st, dr, sp, sta, dat)
-                            
-                            # 【核心修改点 3】记录站点日志 (状态3且站点号变更时触发)
-                            # st=3 对应 remote.c 中的 STATE_STATION
-                            # sta 是当前站点计数
-                            if st == 3 and sta != self.last_log_sta:
-                                # 通过 after 调用 log_sys 确保线程安全
-                                self.root.after(0, self.log_sys, f"抵达站点: 第{sta}站 | 执行停靠程序")
-                                self.last_log_sta = sta
-                                
-                            buf = buf[8:]
-                        else: 
-                            buf=buf[1:]
+                    # 积压的对齐帧整段校验，仅在损坏区域逐字节重同步 (见 telemetry.decode_bulk)
+                    frames, buf = decode_bulk(buf)
+                    # 只发布到总线；记录器同步写盘，界面侧由 pump_bus 在主线程取出 (不再逐帧 after)
+                    t_pc = time.perf_counter()
+                    if frames:
+                        # 同一批帧在上次读取以来陆续到达：时间戳均匀铺开到该区间 (派生的距离变化率依赖逐帧时间戳)
+                        t_rx = time.time(); pub = self.bus.publish; n = len(frames)
+                        span = min(t_rx - t_last_rx, 4 * IO_PERIOD) if t_last_rx else IO_PERIOD
+                        step = max(span, 0.0) / n; t_last_rx = t_rx
+                        for k, (st, dr, sp, sta, dat) in enumerate(frames):
+                            t_f = t_rx - (n - 1 - k) * step
+                            # Spd 高 7 位是探针回显，对其他消费者只保留快/慢位
+                            rtt = probe.on_frame(t_pc, dr, sp)
+                            if rtt is not None: pub(T_RTT, rtt * 1000, probe.stats(), t_f)
+                            pub(T_FRAME, st, dr, sp & SP_FAST, sta, dat, t_f)
+                    probe.expire(t_pc)
                 except: pass
-            time.sleep(0.05)
+            if timer: timer.wait()
+            else:
+                want = time.monotonic() + IO_PERIOD
+                time.sleep(IO_PERIOD)
+                hist.add(time.monotonic() - want)
+
+    # --- 总线订阅者 ---
+    def pump_bus(self):
+        """ 主线程按固定节拍取出总线积压：先统计/告警，再到站日志，最后只画最新一帧 """
+        if not self.run: return
+        try:
+            self.sub_stats.drain(); self.sub_station.drain(); self.sub_view.drain(); self.sub_rtt.drain()
+        finally:
+            self.root.after(BUS_PUMP_MS, self.pump_bus)
+
+    def on_bus_error(self, sub, e):
+        """ 订阅者首次出错 (可能在读线程)：转到主线程写日志，其余订阅者照常投递 """
+        self.root.after(0, self.log_sys, f"总线订阅者 [{sub.name}] 出错: {e!r}")
+
+    # 记录器在读线程 (帧/派生事件) 与主线程 (日志/告警) 都会写入，线程安全由 SessionRecorder 的锁保证；
+    # 先取局部引用，断开时 self.recorder 被置空也不会中途变成 None
+    def rec_event(self, t, kind, text=""):
+        rec = self.recorder
+        if rec: rec.write_event(t, kind, text)
+
+    def rec_frame(self, st, dr, sp, sta, dat, t):
+        rec = self.recorder
+        if rec: rec.write_frame(t, pack_frame(st, dr, sp, sta, dat))
+
+    def rec_state(self, old, new, t):
+        self.rec_event(t, "state", f"{old}->{new}")
+
+    def rec_aeb(self, on, dat, t):
+        self.rec_event(t, "aeb", f"{'on' if on else 'off'} {dat}")
+
+    def rec_link(self, up, info, t):
+        self.rec_event(t, "link", f"{'up' if up else 'down'} {info}".rstrip())
+
+    def rec_rtt(self, rtt_ms, stats, t):
+        self.rec_event(t, "rtt", f"{rtt_ms:.1f} {stats['method']}")
+
+    def show_rtt(self, rtt_ms, stats, t):
+        self.ui.config(self.lbl_rtt, text=fmt_stats(stats), fg=C_CYAN)
+
+    def feed_stats(self, st, dr, sp, sta, dat, t):
+        """ 圈速/站点统计 + 告警规则 + 距离波形历史：每帧都要处理 (主线程内增量更新，O(1)) """
+        lap_n = self.analytics.lap_stat.n
+        self.analytics.feed(t, st, dr, sp, sta, dat)
+        self.alerts.evaluate(t, st, dr, sp, sta, dat)
+        # 距离波形要逐帧记录，放在这里而不是只见到最新一帧的 update_ui；停靠时 dat 是倒计时，不计入
+        if st != 3:
+            self.dist_history.append(dat)
+            if len(self.dist_history) > 100: self.dist_history.pop(0)
+            self.wave_dirty = True
+        if self.analytics.lap_stat.n != lap_n:
+            self.ui.config(self.val_lap, text=f"{self.analytics.lap_stat.last:.1f}s")
+
+    def on_station(self, sta, t):
+        # 【核心修改点 3】记录站点日志 (状态3且站点号变更时由 EventDeriver 派生)
+        self.log_sys(f"抵达站点: 第{sta}站 | 执行停靠程序")
+
+    def on_spd(self, v):
+        self.spd_set = int(float(v))
 
     # --- UI 数据刷新 (核心修复部分) ---
-    def update_ui(self, st, dr, sp, sta, dat):
+    # 文字/颜色查表得到，全部经 self.ui 比较后写入：巡航稳态下每帧几乎不产生 Tk 调用
+    def update_ui(self, st, dr, sp, sta, dat, t_rx=None):
+        # 0. 告警状态取自统计订阅 (pump_bus 中先于显示处理完全部积压帧)
+        al = self.alerts.active
+        ui = self.ui
+        ui.frames += 1
+
         # 1. 速度表显示
-        pwr = self.sc_spd.get() if st in [1,2] else 0
-        self.gauge_spd.set_value(pwr)
+        self.gauge_spd.set_value(self.spd_set if st in (1, 2) else 0)
         
         # 2. 距离/倒计时处理 (匹配 remote.c 逻辑)
-        real_dist = 0
-        is_countdown = False
-        
-        if st == 3: # 状态3：站点停靠
+        st_txt, col_st, dr_txt = STATE_TEXT.get((st, dr, sp)) or render_state(st, dr, sp)
+        is_countdown = st == 3
+        if is_countdown: # 状态3：站点停靠
             # 此时 dat 是倒计时秒数
-            self.val_st.config(text=f"停靠中 {dat}s", fg=C_ORANGE)
-            is_countdown = True
+            ui.config(self.val_st, text=DWELL_TEXT[dat], fg=C_ORANGE)
             # 停靠时，不更新波形图的历史距离，避免出现方波干扰
-            if len(self.dist_history) > 0:
-                real_dist = self.dist_history[-1] 
+            real_dist = self.dist_history[-1] if self.dist_history else 0
         else:
-            # 其他状态：dat 是距离 (cm)
-            real_dist = float(dat)
+            # 其他状态：dat 是距离 (cm)；波形历史由 feed_stats 逐帧写入
+            real_dist = dat
             self.current_distance = real_dist
-            self.dist_history.append(real_dist)
-            if len(self.dist_history) > 100: self.dist_history.pop(0)
             
             # 更新距离表
-            self.gauge_dist.set_value(real_dist)
+            self.gauge_dist.set_value(real_dist, al)
+            # 3. 状态文字颜色
+            ui.config(self.val_st, text=st_txt, fg=col_st)
 
-        # 3. 状态文字颜色
-        st_txt_map = {0:"系统待机", 1:"正在巡航", 2:"紧急避障", 3:"站点停靠"}
-        st_txt = st_txt_map.get(st, "未知状态")
-        
-        col_st = C_TEXT_W
-        if st == 1: col_st = C_GREEN
-        elif st == 2: 
-            st_txt = "主动刹车(AEB)" # 对应 remote.c 的 logic
-            col_st = C_RED
-        elif st == 3: col_st = C_ORANGE
-        
-        if not is_countdown: self.val_st.config(text=st_txt, fg=col_st)
-
-        dr_map = {0:"停止", 1:"全速前进", 2:"正在倒车", 3:"左旋机动", 4:"右旋机动"}
-        dr_text = dr_map.get(dr, "--")
-        
-        # 【修改点 C】：显示速度状态 (快/慢/静止)
-        # 根据协议，sp=1 为高速，sp=0 为低速
-        sp_text = ""
-        if dr == 0 or st in [0, 3]: # 停止或停靠状态
-            sp_text = " (静止)"
-        else:
-            sp_text = " (快)" if sp == 1 else " (慢)"
-            
-        self.val_dr.config(text=f"{dr_text}{sp_text}") # 拼接字符串，例如 "全速前进 (快)"
-        self.val_ct.config(text=str(sta))
+        ui.config(self.val_dr, text=dr_txt)
+        ui.config(self.val_ct, text=NUM_TEXT[sta])
 
         # 4. 雷达副屏逻辑 (修复颜色和圆弧)
-        if self.radar_win.winfo_exists():
+        if self.radar_alive:
             c1, c2, c3 = "#0f1f0f", "#0f1f0f", "#0f1f0f" # 默认暗色
             txt = "航路安全"; col_txt = C_GREEN
             
-            # 仅在非停靠模式下更新雷达警告
+            # 仅在非停靠模式下更新雷达警告 (阈值与迟滞由告警规则决定)
             if not is_countdown:
-                # 对应 remote.c 中的 g_Distance
-                if real_dist > 0:
-                    # 距离 < 60: 外圈绿灯亮
-                    if real_dist < 60: 
-                        c3 = "#1b5e20" # 暗绿
-                        txt = "注意观察"; col_txt = C_GREEN
-                        
-                    # 距离 < 40: 中圈橙灯亮
-                    if real_dist < 40: 
-                        c2 = "#f57f17" # 暗橙
-                        txt = "接近障碍"; col_txt = C_ORANGE
-                        
-                    # 距离 < 20: 内圈红灯亮
-                    if real_dist < 20: 
-                        c1 = "#b71c1c" # 暗红
-                        txt = "碰撞警告"; col_txt = C_RED
+                # 外圈绿灯：dist_caution
+                if al & self.al_caution:
+                    c3 = "#1b5e20" # 暗绿
+                    txt = "注意观察"; col_txt = C_GREEN
+                    
+                # 中圈橙灯：dist_warn
+                if al & self.al_warn:
+                    c2 = "#f57f17" # 暗橙
+                    txt = "接近障碍"; col_txt = C_ORANGE
+                    
+                # 内圈红灯：dist_danger
+                if al & self.al_danger:
+                    c1 = "#b71c1c" # 暗红
+                    txt = "碰撞警告"; col_txt = C_RED
                 
                 # 如果处于 AEB 触发状态 (st=2)
-                if st == 2:
+                if al & self.al_aeb:
                     txt = "主动刹车介入"; col_txt = C_RED
                     if int(time.time()*6)%2: # 快速闪烁
                         c1=c2=c3 = C_RED
             else:
                 txt = "站点作业中"; col_txt = C_ORANGE
 
-            self.rcv.itemconfig(self.lbl_r_dist, text=str(int(real_dist)), fill=col_txt)
-            self.rcv.itemconfig(self.lbl_r_txt, text=txt, fill=col_txt)
+            rcv = self.rcv
+            ui.itemconfig(rcv, self.lbl_r_dist, text=NUM_TEXT[int(real_dist)], fill=col_txt)
+            ui.itemconfig(rcv, self.lbl_r_txt, text=txt, fill=col_txt)
             
             # 更新圆弧颜色 (内、中、外)
-            self.rcv.itemconfig(self.arc_1, outline=c1)
-            self.rcv.itemconfig(self.arc_2, outline=c2)
-            self.rcv.itemconfig(self.arc_3, outline=c3)
+            ui.itemconfig(rcv, self.arc_1, outline=c1)
+            ui.itemconfig(rcv, self.arc_2, outline=c2)
+            ui.itemconfig(rcv, self.arc_3, outline=c3)
 
 if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="STM32 循迹小车上位机")
+    ap.add_argument("--low-jitter", action="store_true", default=LOW_JITTER_IO,
+                    help="读写线程低抖动调度 (绑核/SCHED_FIFO/绝对时刻休眠/缩短 GIL 切换间隔，见 rt_sched.py)")
+    ap.add_argument("--io-cpu", type=int, default=IO_CPU, help="低抖动模式：读写线程绑定的 CPU")
+    ap.add_argument("--io-fifo", type=int, default=IO_FIFO_PRIO, help="低抖动模式：SCHED_FIFO 优先级 (0 = 不申请)")
+    ap.add_argument("--io-switch-ms", type=float, default=IO_SWITCH_MS,
+                    help="低抖动模式：GIL 切换间隔 ms (0 = 不改动；对整个进程生效，退出时恢复)")
+    args = ap.parse_args()
     root = tk.Tk()
-    app = FinalSystem(root)
+    app = FinalSystem(root, args.low_jitter, args.io_cpu, args.io_fifo, args.io_switch_ms)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,235 @@
+"""
+链路读写线程的低抖动调度 (Linux)
+
+读写线程的唤醒时刻受两方面影响：操作系统调度 (与其他进程/核争抢) 和 GIL (Tk 渲染等 Python 代码占着解释器)。
+本模块提供：
+  tune_current_thread : 对调用线程绑核 (sched_setaffinity)、申请 SCHED_FIFO，无权限时退化为调高 nice 优先级；
+                        可选缩短 GIL 切换间隔 (sys.setswitchinterval，进程级)，让被唤醒的线程更快拿到 GIL
+  DeadlineTimer       : 按绝对截止时刻休眠 (clock_nanosleep + TIMER_ABSTIME)，周期误差不累积，落后时跳拍不连发
+  LatenessHist        : 唤醒迟滞 (实际唤醒 - 期望时刻) 分桶直方图
+每一项都可能因平台或权限不可用，此时静默降级并在返回的说明中注明，绝不影响主功能。
+
+测量模式：分别以“普通线程 + 相对 sleep”与“调优后”两种方式运行同一周期任务，可加 GIL 竞争负载模拟界面渲染，
+输出两组唤醒迟滞直方图以便对比：
+    python rt_sched.py --period 0.005 --seconds 10 --load 1 --cpu 1 --fifo 10 [--switch-ms 1]
+上位机中通过 python pc_remoteV6.0.py --low-jitter [--io-cpu N --io-fifo P --io-switch-ms MS] 开启。
+"""
+import os
+import sys
+import time
+import ctypes
+import ctypes.util
+import argparse
+import threading
+from bisect import bisect_right
+
+LAT_EDGES_US = (50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000)   # 直方图桶上界 (微秒)
+SWITCH_INTERVAL = 0.001   # 调优时的 GIL 切换间隔 (秒)，CPython 默认 0.005
+TIMER_ABSTIME = 1
+
+
+# =================================================================
+# [休眠] 绝对截止时刻
+# =================================================================
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+
+def _load_nanosleep():
+    if not sys.platform.startswith("linux"): return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fn = libc.clock_nanosleep
+    except (OSError, AttributeError):
+        return None
+    fn.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.POINTER(_Timespec), ctypes.POINTER(_Timespec)]
+    fn.restype = ctypes.c_int
+    return fn
+
+_clock_nanosleep = _load_nanosleep()
+_CLOCK = getattr(time, "CLOCK_MONOTONIC", 1)
+
+
+def sleep_until(deadline):
+    """ 休眠到 time.monotonic() 时基上的绝对时刻；无 clock_nanosleep 时退化为相对 sleep
+        (ctypes 调用期间释放 GIL) """
+    if _clock_nanosleep is not None:
+        ts = _Timespec(int(deadline), int((deadline % 1.0) * 1e9))
+        while _clock_nanosleep(_CLOCK, TIMER_ABSTIME, ctypes.byref(ts), None) == 4:   # EINTR
+            pass
+        return
+    d = deadline - time.monotonic()
+    if d > 0: time.sleep(d)
+
+
+class LatenessHist:
+    """ [调度] 唤醒迟滞直方图 (常数内存) """
+    def __init__(self, edges=LAT_EDGES_US):
+        self.edges = edges
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (len(self.edges) + 1)
+        self.n = 0; self.total = 0.0; self.max = 0.0
+
+    def add(self, late):
+        us = late * 1e6
+        self.counts[bisect_right(self.edges, us)] += 1
+        self.n += 1; self.total += us
+        if us > self.max: self.max = us
+
+    def percentile(self, p):
+        """ 按桶估计的百分位 (返回所在桶上界，微秒；不超过记录到的最大值) """
+        if not self.n: return 0.0
+        need = p / 100.0 * self.n; acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= need: return min(self.edges[i], self.max) if i < len(self.edges) else self.max
+        return self.max
+
+    def summary(self):
+        return (f"n={self.n} 平均 {self.total / self.n if self.n else 0:.0f}us  "
+                f"p50≤{self.percentile(50):.0f}us  p99≤{self.percentile(99):.0f}us  最大 {self.max:.0f}us")
+
+    def render(self, width=40):
+        lines = []
+        top = max(self.counts) or 1
+        lo = 0
+        for i, c in enumerate(self.counts):
+            hi = f"{self.edges[i]}" if i < len(self.edges) else "∞"
+            bar = "#" * max(1 if c else 0, round(c / top * width))
+            lines.append(f"  {lo:>6}-{hi:<6}us {c:>8} {c / self.n * 100 if self.n else 0:6.2f}% {bar}")
+            lo = self.edges[i] if i < len(self.edges) else lo
+        return "\n".join(lines)
+
+
+class DeadlineTimer:
+    """ [调度] 周期定时器：按绝对截止时刻唤醒，误差不累积；落后超过一个周期时跳过错过的拍 """
+    def __init__(self, period, hist=None):
+        self.period = period
+        self.next = time.monotonic() + period
+        self.hist = hist
+        self.skipped = 0
+
+    def wait(self):
+        d = self.next
+        sleep_until(d)
+        now = time.monotonic()
+        if self.hist is not None: self.hist.add(now - d)
+        self.next = d + self.period
+        if now >= self.next:
+            k = int((now - d) // self.period)
+            self.skipped += k; self.next = d + (k + 1) * self.period
+        return now
+
+
+# =================================================================
+# [调度] 线程级调优 (对调用线程生效)
+# =================================================================
+
+def tune_current_thread(cpu=None, fifo_prio=None, nice=-10, switch_interval=SWITCH_INTERVAL):
+    """ 返回 (已生效项列表, 未生效项列表)；任何一项失败都只降级不抛异常
+        switch_interval 对整个进程生效 (0/None = 不改动)，调用方应在线程结束时用 sys.setswitchinterval 恢复 """
+    ok, failed = [], []
+    tid = threading.get_native_id() if hasattr(threading, "get_native_id") else 0
+    if cpu is not None:
+        if hasattr(os, "sched_setaffinity"):
+            try: os.sched_setaffinity(tid, {cpu}); ok.append(f"绑定 CPU{cpu}")
+            except (OSError, ValueError) as e: failed.append(f"绑核 ({e})")
+        else: failed.append("绑核 (平台不支持)")
+    fifo = False
+    if fifo_prio:
+        if hasattr(os, "sched_setscheduler"):
+            try:
+                os.sched_setscheduler(tid, os.SCHED_FIFO, os.sched_param(fifo_prio))
+                ok.append(f"SCHED_FIFO {fifo_prio}"); fifo = True
+            except OSError as e: failed.append(f"SCHED_FIFO ({e.strerror or e})")
+        else: failed.append("SCHED_FIFO (平台不支持)")
+    if not fifo and nice is not None:
+        if hasattr(os, "setpriority"):
+            # Linux 下 nice 值按线程生效 (who = 线程 id)；降低 nice 通常需要 CAP_SYS_NICE
+            try: os.setpriority(os.PRIO_PROCESS, tid, nice); ok.append(f"nice {nice}")
+            except OSError as e: failed.append(f"nice {nice} ({e.strerror or e})")
+        else: failed.append("nice (平台不支持)")
+    if switch_interval:
+        sys.setswitchinterval(switch_interval); ok.append(f"GIL 切换 {switch_interval * 1000:g}ms")
+    if _clock_nanosleep is not None: ok.append("clock_nanosleep 绝对时刻")
+    else: failed.append("clock_nanosleep (退化为相对 sleep)")
+    return ok, failed
+
+
+# =================================================================
+# [测量] 调优前后唤醒迟滞对比
+# =================================================================
+
+def _gil_load(stop):
+    """ 纯 Python 计算，持续争抢 GIL (模拟 Tk 渲染/统计线程) """
+    while not stop.is_set():
+        sum(i * i for i in range(2000))
+
+
+def measure(period, seconds, tuned, cpu=None, fifo_prio=None, nice=-10, load=0, switch_interval=SWITCH_INTERVAL):
+    hist = LatenessHist()
+    note = {}
+    stop = threading.Event()
+
+    def worker():
+        if tuned:
+            note["ok"], note["failed"] = tune_current_thread(cpu, fifo_prio, nice, switch_interval)
+            timer = DeadlineTimer(period, hist)
+            t_end = time.monotonic() + seconds
+            while time.monotonic() < t_end: timer.wait()
+            note["skipped"] = timer.skipped
+        else:
+            # 与原 loop() 相同：普通线程 + 相对 sleep；迟滞 = 实际唤醒 - 请求的唤醒时刻
+            t_end = time.monotonic() + seconds
+            while time.monotonic() < t_end:
+                want = time.monotonic() + period
+                time.sleep(period)
+                hist.add(time.monotonic() - want)
+
+    old_si = sys.getswitchinterval()
+    loaders = [threading.Thread(target=_gil_load, args=(stop,), daemon=True) for _ in range(load)]
+    for th in loaders: th.start()
+    w = threading.Thread(target=worker)
+    w.start(); w.join()
+    stop.set()
+    for th in loaders: th.join()
+    sys.setswitchinterval(old_si)
+    return hist, note
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="读写线程唤醒迟滞测量 (调优前后对比)")
+    ap.add_argument("--period", type=float, default=0.005, help="唤醒周期 (秒)")
+    ap.add_argument("--seconds", type=float, default=5)
+    ap.add_argument("--load", type=int, default=1, help="GIL 竞争线程数 (模拟界面渲染)")
+    ap.add_argument("--cpu", type=int, help="绑定的 CPU 编号")
+    ap.add_argument("--fifo", type=int, default=10, help="SCHED_FIFO 优先级 (0 = 不申请)")
+    ap.add_argument("--nice", type=int, default=-10, help="无 SCHED_FIFO 权限时的 nice 值")
+    ap.add_argument("--switch-ms", type=float, default=SWITCH_INTERVAL * 1000,
+                    help="调优时的 GIL 切换间隔 ms (0 = 不改动；进程级，测量结束后恢复)")
+    args = ap.parse_args(argv)
+
+    print(f"周期 {args.period * 1000:g}ms, 每组 {args.seconds:g}s, GIL 竞争线程 {args.load}")
+    res = {}
+    for tuned in (False, True):
+        label = "调优后" if tuned else "调优前 (普通线程 + 相对 sleep)"
+        hist, note = measure(args.period, args.seconds, tuned, args.cpu, args.fifo, args.nice, args.load,
+                             args.switch_ms / 1000)
+        res[tuned] = hist
+        print(f"\n[{label}] {hist.summary()}")
+        if tuned:
+            print("  已生效: " + (", ".join(note["ok"]) or "无"))
+            if note["failed"]: print("  未生效: " + ", ".join(note["failed"]))
+            if note["skipped"]: print(f"  跳拍: {note['skipped']}")
+        print(hist.render())
+    a, b = res[False], res[True]
+    print(f"\np99 迟滞: {a.percentile(99):.0f}us -> {b.percentile(99):.0f}us   "
+          f"最大: {a.max:.0f}us -> {b.max:.0f}us")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
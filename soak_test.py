@@ -0,0 +1,247 @@
+"""
+长时间值守 (soak) 测试
+
+用仿真小车以加速时间驱动上位机，连续运行若干“仿真小时”，定期采样：
+  - 进程常驻内存 RSS
+  - Tk 画布图元总数 / 图元最大编号 / 待执行 after 回调数 / 日志框行数      (--gui)
+    (图元编号只增不减：删除后重建的图元总数不变，但最大编号会持续增长)
+  - 总线统计订阅的积压与累计丢帧
+  - 总线延迟 (帧发布时刻到订阅者处理时刻)
+  - 每帧 Tk 调用数 (差值刷新层计数)                            (--gui)
+对采样做最小二乘拟合，任一指标在运行期间的预计增长超过阈值即判定失败 (退出码 1)。
+
+两种模式：
+  默认 (无界面)：读线程 = 仿真串口 + decode_bulk + 总线发布 (记录器同步订阅)，
+                UI 线程 = 排空统计/告警订阅队列
+  --gui        ：加载 pc_remoteV6.0.py 的 FinalSystem，用仿真串口替换真实串口 (需要显示器及全部依赖)
+
+用法: python soak_test.py --hours 8 --rate 200 --accel 60 [--gui] [--csv soak.csv]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+
+from telemetry import SessionRecorder, decode_bulk, pack_frame
+from analytics import LapAnalytics
+from alerts import AlertEngine
+from car_sim import SimCar, SimSerial
+from frame_bus import FrameBus, EventDeriver, SYNC, QUEUED, T_FRAME
+
+# 指标 -> (绝对容差, 相对容差)：预计增长同时超过 max(绝对, 相对 × 基线) 才判失败
+TOLERANCE = {
+    "rss_mb":     (8.0, 0.10),
+    "backlog":    (50, 0.0),
+    "latency_ms": (5.0, 0.5),
+    "canvas":     (5, 0.0),
+    "canvas_ids": (5, 0.0),
+    "after":      (20, 0.0),
+    "log_lines":  (50, 0.0),
+    "dropped":    (0, 0.0),
+    "tk_per_frame": (1.0, 0.5),
+}
+WARMUP = 0.2   # 前 20% 采样视为预热，不参与趋势判定
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, AttributeError):
+        import resource   # 非 Linux：退化为峰值 RSS
+        r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return r / 1e6 if sys.platform == "darwin" else r / 1e3
+
+
+def trend(samples, warmup=WARMUP):
+    """ 最小二乘斜率 × 采样跨度 = 运行期内的预计增长量；同时返回基线 (预热后首个采样值) """
+    pts = samples[int(len(samples) * warmup):]
+    n = len(pts)
+    if n < 3: return 0.0, 0.0
+    mx = sum(x for x, _ in pts) / n
+    my = sum(y for _, y in pts) / n
+    sxx = sum((x - mx) ** 2 for x, _ in pts)
+    sxy = sum((x - mx) * (y - my) for x, y in pts)
+    slope = sxy / sxx if sxx else 0.0
+    return slope * (pts[-1][0] - pts[0][0]), pts[0][1]
+
+
+def bus_probe(sub):
+    """ 订阅者的区间统计：返回函数，每次调用给出 (上次调用以来的平均延迟 ms, 当前积压, 累计丢弃) """
+    last = [0, 0.0]
+    def probe():
+        n = sub.delivered - last[0]; tot = sub.lag_total - last[1]
+        last[0], last[1] = sub.delivered, sub.lag_total
+        return tot / n * 1000 if n else 0.0, len(sub.items), sub.dropped
+    return probe
+
+
+# =================================================================
+# [无界面模式] 读线程 -> 总线 -> UI 线程
+# =================================================================
+
+def soak_headless(args, sample):
+    car = SimCar(seed=args.seed)
+    ser = SimSerial(car, args.rate, args.accel)
+    eng = LapAnalytics(); al = AlertEngine()
+    tmp = tempfile.TemporaryDirectory()   # 会话与事件文件都在其中，结束时整体删除
+    rec = SessionRecorder(os.path.join(tmp.name, "soak.tlm"))
+    run = [True]
+
+    # 与 FinalSystem 相同的订阅结构 (帧时间戳用仿真时刻)
+    bus = FrameBus(); EventDeriver(bus)
+    bus.subscribe(T_FRAME, lambda st, dr, sp, sta, dat, t: rec.write_frame(t, pack_frame(st, dr, sp, sta, dat)),
+                  SYNC, name="记录器")
+    def feed(st, dr, sp, sta, dat, t):
+        eng.feed(t, st, dr, sp, sta, dat); al.evaluate(t, st, dr, sp, sta, dat)
+    sub = bus.subscribe(T_FRAME, feed, QUEUED, 4096, "统计/告警")
+    stat = bus_probe(sub)
+
+    def reader():
+        buf = b''
+        while run[0]:
+            if ser.in_waiting: buf += ser.read(ser.in_waiting)
+            frames, buf = decode_bulk(buf)
+            t_sim = ser.sim_t
+            for f in frames: bus.publish(T_FRAME, *f, t_sim)
+            time.sleep(0.05 / args.accel if args.accel > 1 else 0.05)
+
+    def ui():
+        while run[0]:
+            if not sub.drain(): time.sleep(0.005)
+
+    threads = [threading.Thread(target=reader, daemon=True), threading.Thread(target=ui, daemon=True)]
+    for th in threads: th.start()
+
+    def probe():
+        lag, depth, dropped = stat()
+        return {"rss_mb": rss_mb(), "backlog": depth, "dropped": dropped, "latency_ms": lag}
+
+    try:
+        sample(lambda: ser.sim_t, probe)
+    finally:
+        run[0] = False
+        for th in threads: th.join(1.0)
+        rec.close()
+        tmp.cleanup()
+
+
+# =================================================================
+# [界面模式] 驱动真实 FinalSystem
+# =================================================================
+
+def load_app():
+    import importlib.util
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pc_remoteV6.0.py")
+    spec = importlib.util.spec_from_file_location("pc_remote", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def soak_gui(args, sample):
+    import tkinter as tk
+    mod = load_app()
+    root = tk.Tk()
+    app = mod.FinalSystem(root)
+    ser = SimSerial(SimCar(seed=args.seed), args.rate, args.accel)
+    app.ser = ser; app.conn = True
+
+    # 延迟取显示订阅 (发布到画面刷新)，积压/丢帧取统计订阅
+    view = bus_probe(app.sub_view); stats = bus_probe(app.sub_stats)
+    tk_last = [0, 0]
+
+    canvases = []
+    def walk(w):
+        if isinstance(w, tk.Canvas): canvases.append(w)
+        for c in w.winfo_children(): walk(c)
+    walk(root)
+
+    def probe():
+        lag = view()[0]; _, depth, dropped = stats()
+        ui = app.ui; n = ui.frames - tk_last[1]
+        tk_rate = (ui.calls - tk_last[0]) / n if n else 0.0
+        tk_last[0], tk_last[1] = ui.calls, ui.frames
+        return {
+            "rss_mb": rss_mb(),
+            "canvas": sum(len(c.find_all()) for c in canvases),
+            "canvas_ids": sum(max(c.find_all(), default=0) for c in canvases),
+            "after": len(root.tk.splitlist(root.tk.call("after", "info"))),
+            "log_lines": int(app.txt_log.index("end-1c").split(".")[0]),
+            "backlog": depth, "dropped": dropped,
+            "latency_ms": lag, "tk_per_frame": tk_rate,
+        }
+
+    # 采样循环在 Tk 主循环中以 after 驱动
+    gen = sample(lambda: ser.sim_t, probe, step=True)
+
+    def tick():
+        try: next(gen)
+        except StopIteration:
+            app.run = False; root.destroy(); return
+        root.after(200, tick)
+    root.after(200, tick)
+    root.mainloop()
+
+
+# =================================================================
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="上位机长时间值守测试 (加速时间)")
+    ap.add_argument("--hours", type=float, default=2.0, help="仿真时长 (小时)")
+    ap.add_argument("--rate", type=float, default=200, help="仿真遥测帧率 (帧/秒)")
+    ap.add_argument("--accel", type=float, default=60, help="时间加速倍数")
+    ap.add_argument("--every", type=float, default=300, help="采样间隔 (仿真秒)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--gui", action="store_true", help="驱动完整界面 (需要显示器)")
+    ap.add_argument("--csv", help="采样结果另存为 CSV")
+    args = ap.parse_args(argv)
+
+    duration = args.hours * 3600
+    series = {}
+    rows = []
+
+    def sample(sim_clock, probe, step=False):
+        """ 每隔 args.every 仿真秒采样一次；step=True 时作为生成器供 Tk after 驱动 """
+        def body():
+            next_t = args.every
+            while sim_clock() < duration:
+                if sim_clock() >= next_t:
+                    m = probe()
+                    t = sim_clock()
+                    rows.append((t, m))
+                    for k, v in m.items(): series.setdefault(k, []).append((t, v))
+                    print(f"[{t/3600:6.2f}h] " + "  ".join(f"{k}={v:.1f}" for k, v in m.items()))
+                    sys.stdout.flush()
+                    next_t += args.every
+                yield
+        if step: return body()
+        for _ in body(): time.sleep(0.05)
+
+    print(f"soak: {args.hours}h 仿真, {args.rate:.0f} 帧/秒, 加速 {args.accel:.0f}x "
+          f"(约 {duration / args.accel / 60:.1f} 分钟), 模式 {'界面' if args.gui else '无界面'}")
+    (soak_gui if args.gui else soak_headless)(args, sample)
+
+    if args.csv and rows:
+        keys = sorted(rows[0][1])
+        with open(args.csv, "w", encoding="utf-8") as f:
+            f.write("t," + ",".join(keys) + "\n")
+            for t, m in rows: f.write(f"{t:.1f}," + ",".join(f"{m[k]:.3f}" for k in keys) + "\n")
+
+    failed = []
+    for k, pts in series.items():
+        growth, base = trend(pts)
+        abs_tol, rel_tol = TOLERANCE.get(k, (0.0, 0.1))
+        limit = max(abs_tol, rel_tol * abs(base))
+        verdict = "失败" if growth > limit else "通过"
+        if growth > limit: failed.append(k)
+        print(f"{k:<12} 预计增长 {growth:+10.2f}  (阈值 {limit:.2f})  {verdict}")
+    if failed:
+        print("soak 失败: " + ", ".join(failed)); return 1
+    print("soak 通过"); return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+遥测协议与会话记录 (与 remote.c 严格对应)
+
+下行帧: 55 [State] [Dir] [Spd] [Sta] [Data] [Sum] AA
+上行帧: A5 [JoyX] [JoyY] [Mode] [Sum] 5A
+参数帧: B5 [Spd] [Tim] 00 [Sum] 5B   (Spd = 巡航功率 %, Tim = 停靠秒数)
+探针帧: C5 [Tag] 00 00 [Sum] 5C      (延迟探针，Tag = 1..127；旧固件不识别，直接丢弃)
+
+下行 Spd 字段: bit0 = 快/慢；bit1-7 = 最近一次收到的探针 Tag 回显 (旧固件恒为 0)
+
+会话文件 (.tlm): 连续的 16 字节记录 = 接收时间戳(<d, 秒) + 原始 8 字节帧
+事件文件 (.evt): 每行 "时间戳<TAB>类型<TAB>内容"，与 .tlm 同名
+"""
+import os
+import struct
+import datetime
+import threading
+
+try:
+    import numpy as np   # 可选：离线批处理向量化
+except ImportError:
+    np = None
+
+# --- 协议定义 ---
+TX_HEADER = 0xA5; TX_TAIL = 0x5A
+RX_HEADER = 0x55; RX_TAIL = 0xAA
+SET_HEADER = 0xB5; SET_TAIL = 0x5B
+PROBE_HEADER = 0xC5; PROBE_TAIL = 0x5C
+SP_FAST = 0x01       # 下行 Spd 的快/慢位
+ECHO_SHIFT = 1       # 下行 Spd 中探针回显 Tag 的位移
+TAG_MAX = 0x7F
+FRAME_LEN = 8
+
+# 下行 State 字段 (remote.c 状态机)
+ST_IDLE, ST_CRUISE, ST_AEB, ST_STATION = 0, 1, 2, 3
+
+# 赛道站点数 (一圈内的停靠站数量，按实际赛道修改)
+STATIONS_PER_LAP = 3
+
+# 帧结构 (预编译)
+RX_STRUCT = struct.Struct('8B')
+HDR_BYTE = bytes([RX_HEADER])
+BULK_WINDOW = 1 << 16   # 单块校验的最大帧数
+BULK_NP_MIN = 256       # 块小于该帧数时 numpy 调用开销不划算，走 iter_unpack
+BULK_RESTART = 32       # 损坏后重新开始的块大小 (帧)，无损坏时逐块倍增到 BULK_WINDOW
+
+# 会话记录格式
+REC_FMT = struct.Struct('<d8s')
+REC_LEN = REC_FMT.size
+SESSION_EXT = ".tlm"
+EVENT_EXT = ".evt"
+
+# 列式导出的列顺序
+COLUMNS = ("t", "st", "dr", "sp", "sta", "dat")
+if np is not None:
+    REC_DTYPE = np.dtype([("t", "<f8"), ("raw", "u1", (FRAME_LEN,))])
+
+SESSION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions")
+
+
+def frame_ok(buf, i):
+    """ buf[i:i+8] 是否为一帧合法下行帧 """
+    return (buf[i] == RX_HEADER and buf[i+7] == RX_TAIL and
+            sum(buf[i+1:i+6]) & 0xFF == buf[i+6])
+
+
+def _valid_run(buf, i, m, out):
+    """ 从 i 起按 8 字节对齐逐帧检查至多 m 帧 (iter_unpack)，把开头连续合法的帧追加到 out，返回其帧数 """
+    good = 0
+    for h, st, dr, sp, sta, dat, chk, tl in RX_STRUCT.iter_unpack(memoryview(buf)[i:i+m*FRAME_LEN]):
+        if h != RX_HEADER or tl != RX_TAIL or (st+dr+sp+sta+dat) & 0xFF != chk: break
+        out.append((st, dr, sp, sta, dat))
+        good += 1
+    return good
+
+
+def _np_block(buf, i, m):
+    """ 从 i 起 8 字节对齐的 m 帧整块校验一次，返回 (帧数组, 坏帧下标) """
+    a = np.frombuffer(buf, np.uint8, count=m*FRAME_LEN, offset=i).reshape(m, FRAME_LEN)
+    ok = (a[:, 0] == RX_HEADER) & (a[:, 7] == RX_TAIL) & \
+         ((a[:, 1:6].sum(axis=1, dtype=np.uint16) & 0xFF) == a[:, 6])
+    return a, np.flatnonzero(~ok)
+
+
+def decode_bulk(buf, window=BULK_WINDOW):
+    """ 批量解码：对齐的连续帧整段校验 (大块用 numpy 向量化，否则 iter_unpack)，
+        只在损坏区域退回逐字节重同步。返回 ([(st, dr, sp, sta, dat), ...], 剩余缓冲)
+        numpy 块的坏帧位置一次算出，重同步后仍在同一对齐上时直接复用；
+        错位 (丢字节) 或小块内损坏后从 BULK_RESTART 帧重新开始，无损坏则逐块倍增 """
+    out = []
+    i, n = 0, len(buf)
+    blk = None; base = 0; w = window
+    while n - i >= FRAME_LEN:
+        if blk is not None and ((i - base) % FRAME_LEN or i - base >= len(blk[0]) * FRAME_LEN):
+            if (i - base) % FRAME_LEN: w = BULK_RESTART   # 错位：旧块作废
+            blk = None
+        m = min((n - i) // FRAME_LEN, w)
+        if blk is None and np is not None and m >= BULK_NP_MIN:
+            blk = _np_block(buf, i, m); base = i
+        if blk is not None:
+            a, bad = blk
+            k = (i - base) // FRAME_LEN
+            p = bad.searchsorted(k)
+            e = int(bad[p]) if p < len(bad) else len(a)
+            if e > k: out.extend(zip(*a[k:e, 1:6].T.tolist()))
+            i = base + e * FRAME_LEN
+            if e == len(a):
+                w = min(w * 2, window); continue
+        else:
+            good = _valid_run(buf, i, m, out)
+            i += good * FRAME_LEN
+            if good == m:
+                w = min(w * 2, window); continue
+            w = BULK_RESTART
+        # 损坏区域：跳到下一个帧头并验证，找到合法帧后恢复整段模式
+        i += 1
+        while n - i >= FRAME_LEN:
+            j = buf.find(HDR_BYTE, i)
+            if j < 0: i = n; break
+            i = j
+            if n - j < FRAME_LEN or frame_ok(buf, j): break
+            i = j + 1
+    return out, buf[i:]
+
+
+def pack_frame(st, dr, sp, sta, dat):
+    """ 按下行协议打包一帧 (用于回放/仿真) """
+    chk = (st + dr + sp + sta + dat) & 0xFF
+    return struct.pack('BBBBBBBB', RX_HEADER, st, dr, sp, sta, dat, chk, RX_TAIL)
+
+
+def pack_control(jx, jy, mode):
+    """ 上行控制帧：摇杆 (int8) + 模式 """
+    chk = ((jx & 0xFF) + (jy & 0xFF) + (mode & 0xFF)) & 0xFF
+    return struct.pack('BbbBBB', TX_HEADER, jx, jy, mode, chk, TX_TAIL)
+
+
+def pack_settings(spd, tim):
+    """ 参数帧：巡航功率 % + 停靠秒数 """
+    return struct.pack('BBBBBB', SET_HEADER, spd, tim, 0, (spd + tim) & 0xFF, SET_TAIL)
+
+
+def pack_probe(tag):
+    """ 延迟探针帧：车端在之后的下行帧 Spd 高 7 位回显 tag """
+    return struct.pack('BBBBBB', PROBE_HEADER, tag, 0, 0, tag & 0xFF, PROBE_TAIL)
+
+
+def joy_to_dr(jx, jy):
+    """ 手动模式下摇杆 -> 下行 Dir 字段 (remote.c 的映射，死区 ±20) """
+    if jy > 20: return 1
+    if jy < -20: return 2
+    if jx < -20: return 3
+    if jx > 20: return 4
+    return 0
+
+
+def new_session_path(folder=SESSION_DIR):
+    os.makedirs(folder, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(folder, f"run_{stamp}{SESSION_EXT}")
+
+
+def list_sessions(folder=SESSION_DIR):
+    if not os.path.isdir(folder): return []
+    return sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(SESSION_EXT))
+
+
+class SessionRecorder:
+    """ [记录] 原始帧 + 事件落盘，供回放与离线分析
+        读线程 (帧/派生事件) 与主线程 (日志/告警/断开) 都会写入，所有文件操作在同一把锁内进行；
+        close() 之后的写入直接忽略 """
+    def __init__(self, path=None):
+        self.path = path or new_session_path()
+        self.f = open(self.path, "wb", buffering=64*1024)
+        self.f_evt = None
+        self.frames = 0
+        self.lock = threading.Lock()
+
+    def write_frame(self, t, raw):
+        with self.lock:
+            if self.f is None: return
+            self.f.write(REC_FMT.pack(t, raw))
+            self.frames += 1
+
+    def write_event(self, t, kind, text=""):
+        with self.lock:
+            if self.f is None: return
+            if self.f_evt is None:
+                self.f_evt = open(self.path[:-len(SESSION_EXT)] + EVENT_EXT, "a", encoding="utf-8")
+            self.f_evt.write(f"{t:.6f}\t{kind}\t{text}\n")
+
+    def close(self):
+        with self.lock:
+            if self.f:
+                self.f.close(); self.f = None
+            if self.f_evt:
+                self.f_evt.close(); self.f_evt = None
+
+
+def iter_records(path, chunk_records=4096):
+    """ 分块读取会话文件，逐条产出 (t, raw)；结尾不完整的记录被丢弃 """
+    with open(path, "rb") as f:
+        while True:
+            blk = f.read(REC_LEN * chunk_records)
+            if not blk: break
+            usable = len(blk) - len(blk) % REC_LEN
+            yield from REC_FMT.iter_unpack(blk[:usable])
+            if usable < len(blk): break
+
+
+def iter_session(path):
+    """ 逐条产出已解码的 (t, st, dr, sp, sta, dat)，跳过校验失败的记录 (分块批量校验) """
+    for cols, _ in iter_column_chunks(path, 65536):
+        yield from zip(*(cols[c].tolist() if hasattr(cols[c], "tolist") else cols[c] for c in COLUMNS))
+
+
+def iter_capture(path, chunk_bytes=1 << 20):
+    """ 解码原始串口抓包文件 (无时间戳的字节流)，逐条产出 (st, dr, sp, sta, dat) """
+    rest = b''
+    with open(path, "rb") as f:
+        while True:
+            blk = f.read(chunk_bytes)
+            if not blk: break
+            frames, rest = decode_bulk(rest + blk)
+            yield from frames
+
+
+def iter_events(path):
+    """ 读取会话对应的事件文件，产出 (t, kind, text) """
+    evt = path[:-len(SESSION_EXT)] + EVENT_EXT if path.endswith(SESSION_EXT) else path
+    if not os.path.exists(evt): return
+    with open(evt, encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t", 2)
+            if len(parts) < 2: continue
+            yield float(parts[0]), parts[1], parts[2] if len(parts) > 2 else ""
+
+
+def iter_column_chunks(path, chunk_records=1 << 20):
+    """ 按固定记录数分块读取会话，产出 (列字典, 本块记录总数)，只保留校验通过的帧
+        有 numpy 时列为 ndarray (头尾/校验和整块向量化检查)，否则为 list """
+    with open(path, "rb") as f:
+        while True:
+            blk = f.read(REC_LEN * chunk_records)
+            usable = len(blk) - len(blk) % REC_LEN
+            if not usable: break
+            if np is not None:
+                rec = np.frombuffer(blk, dtype=REC_DTYPE, count=usable // REC_LEN)
+                raw = rec["raw"]
+                ok = (raw[:, 0] == RX_HEADER) & (raw[:, 7] == RX_TAIL) & \
+                     ((raw[:, 1:6].sum(axis=1, dtype=np.uint32) & 0xFF) == raw[:, 6])
+                good = raw[ok]
+                cols = {"t": rec["t"][ok]}
+                for i, name in enumerate(COLUMNS[1:], start=1):
+                    cols[name] = good[:, i]
+            else:
+                cols = {c: [] for c in COLUMNS}
+                ct, cst, cdr, csp, csta, cdat = (cols[c] for c in COLUMNS)
+                for t, raw in REC_FMT.iter_unpack(blk[:usable]):
+                    if raw[0] != RX_HEADER or raw[7] != RX_TAIL: continue
+                    st, dr, sp, sta, dat, chk = raw[1:7]
+                    if (st+dr+sp+sta+dat) & 0xFF != chk: continue
+                    ct.append(t); cst.append(st); cdr.append(dr); csp.append(sp); csta.append(sta); cdat.append(dat)
+            yield cols, usable // REC_LEN
+            if usable < len(blk): break
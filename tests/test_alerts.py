@@ -0,0 +1,128 @@
+import json
+
+import pytest
+
+from alerts import DEFAULT_RULES, AlertEngine, load_rules
+
+
+def feed(eng, dists, st=1, t0=0.0, dt=0.02):
+    """ 依次送入距离读数，返回每帧后的告警位掩码 """
+    return [eng.evaluate(t0 + k * dt, st, 0, 0, 0, d) for k, d in enumerate(dists)]
+
+
+def bits(eng, *names):
+    m = 0
+    for n in names: m |= eng.bit(n)
+    return m
+
+
+def test_thresholds():
+    eng = AlertEngine(DEFAULT_RULES)
+    caution, warn, danger = (bits(eng, n) for n in ("dist_caution", "dist_warn", "dist_danger"))
+    assert feed(eng, [100])[-1] == 0
+    assert feed(eng, [50])[-1] == caution
+    assert feed(eng, [30])[-1] == caution | warn
+    assert feed(eng, [10])[-1] == caution | warn | danger
+
+
+def test_hysteresis_holds_near_threshold():
+    eng = AlertEngine(DEFAULT_RULES)
+    warn = bits(eng, "dist_warn")
+    assert feed(eng, [39])[-1] & warn
+    assert feed(eng, [41, 42])[-1] & warn          # 40 + 3 以内保持
+    assert not feed(eng, [43])[-1] & warn          # 超出迟滞带解除
+
+
+def test_zero_reading_clears_distance_alerts():
+    """ 0 表示无回波：有效性子句 dist > 0 不加迟滞，已触发的距离告警必须解除 """
+    eng = AlertEngine(DEFAULT_RULES)
+    dist = bits(eng, "dist_caution", "dist_warn", "dist_danger")
+    assert feed(eng, [15])[-1] & dist == dist
+    assert feed(eng, [0, 0])[-1] & dist == 0
+
+
+def test_rule_level_hyst_skips_guards():
+    eng = AlertEngine([{"name": "near", "when": "dat >= 1 and dat < 10", "hyst": 5}])
+    assert feed(eng, [5, 12]) == [1, 1]
+    assert feed(eng, [0]) == [0]
+
+
+def test_clause_hyst_overrides_rule_hyst():
+    eng = AlertEngine([{"name": "near", "when": "dist > 0 and dist < 10 ~1", "hyst": 5}])
+    assert feed(eng, [5, 10, 11]) == [1, 1, 0]
+
+
+def test_station_state_suppresses_distance_alerts():
+    eng = AlertEngine(DEFAULT_RULES)
+    assert feed(eng, [10])[-1]
+    assert feed(eng, [5], st=3)[-1] & bits(eng, "dist_warn") == 0
+
+
+def test_for_delay_and_events():
+    events = []
+    eng = AlertEngine([{"name": "aeb_stuck", "when": "st == 2", "for": 1.0, "level": "danger"}],
+                      on_event=lambda t, r, on: events.append((round(t, 2), r["name"], on)))
+    eng.evaluate(0.0, 2, 0, 0, 0, 5)
+    assert eng.active == 0
+    eng.evaluate(0.5, 2, 0, 0, 0, 5)
+    assert eng.active == 0
+    eng.evaluate(1.0, 2, 0, 0, 0, 5)
+    assert eng.active == 1
+    eng.evaluate(1.2, 1, 0, 0, 0, 5)
+    assert eng.active == 0
+    assert events == [(1.0, "aeb_stuck", True), (1.2, "aeb_stuck", False)]
+
+
+def test_closing_rate():
+    eng = AlertEngine()
+    fast = bits(eng, "fast_closing")
+    # 每 20ms 接近 5cm = 250cm/s，持续 0.2s 后触发
+    masks = feed(eng, list(range(240, 100, -5)))
+    assert masks[-1] & fast
+    assert not feed(AlertEngine(), [100] * 20)[-1] & fast
+
+
+def test_clause_without_spaces():
+    eng = AlertEngine([{"name": "near", "when": "dist>0 and dist<5 and st!=3"}])
+    assert feed(eng, [3, 6, 0]) == [1, 0, 0]
+
+
+@pytest.mark.parametrize("text", ["dist <", "foo < 3", "dist << 3", "dist < 4 ~", "dist < 4 or st == 1"])
+def test_bad_clause(text):
+    with pytest.raises(ValueError):
+        AlertEngine([{"name": "x", "when": text}])
+
+
+@pytest.mark.parametrize("rules", [
+    {"name": "x", "when": "st == 2"},
+    [{"when": "st == 2"}],
+    [{"name": "x"}],
+    [{"name": "x", "when": "st == 2"}, {"name": "x", "when": "st == 1"}],
+    [{"name": "x", "when": "st == 2", "level": "fatal"}],
+    [{"name": "x", "when": "st == 2", "for": "3"}],
+])
+def test_load_rules_rejects_bad_file(tmp_path, rules):
+    p = tmp_path / "alert_rules.json"
+    p.write_text(json.dumps(rules), encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_rules(str(p))
+
+
+def test_load_rules(tmp_path):
+    assert load_rules(str(tmp_path / "missing.json")) is DEFAULT_RULES
+    p = tmp_path / "alert_rules.json"
+    p.write_text(json.dumps([{"name": "x", "when": "dist<5"}]), encoding="utf-8")
+    assert AlertEngine(load_rules(str(p))).bit("x") == 1
+
+
+def test_closing_rate_with_batched_timestamps():
+    """ 读线程一次取出多帧共用一个时间戳：变化率仍应按真实接近速度计算 """
+    eng = AlertEngine()
+    fast = bits(eng, "fast_closing")
+    d = 255; masks = []
+    for k in range(25):                 # 每 40ms 读取一批 (2 帧 x 20ms)，真实接近速度 250cm/s
+        for _ in range(2):
+            d -= 5; masks.append(eng.evaluate(k * 0.04, 1, 0, 0, 0, d))
+    assert abs(eng.rate + 250) < 5
+    assert masks[-1] & fast
+    assert eng.dist == d
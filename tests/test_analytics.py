@@ -0,0 +1,93 @@
+import json
+
+from analytics import LapAnalytics, index_path
+from car_sim import SimCar
+from telemetry import ST_AEB, ST_CRUISE, ST_STATION, SessionRecorder, pack_frame
+
+
+def drive(eng, script, t0=0.0, dt=0.1):
+    """ script: [(st, sta, dat, 帧数), ...] 逐段展开成帧送入 """
+    t = t0
+    for st, sta, dat, n in script:
+        for _ in range(n):
+            eng.feed(t, st, 0, 1, sta, dat); t += dt
+    return t
+
+
+def test_laps_dwell_and_segments():
+    eng = LapAnalytics(2)
+    drive(eng, [
+        (ST_CRUISE, 0, 200, 10),     # 发车
+        (ST_STATION, 1, 5, 20),      # 1 号站停 2s
+        (ST_CRUISE, 1, 200, 10),
+        (ST_AEB, 1, 15, 5),          # 区间 1-2 内一次 AEB
+        (ST_CRUISE, 1, 200, 5),
+        (ST_STATION, 2, 5, 10),      # 2 号站
+        (ST_CRUISE, 2, 200, 30),
+        (ST_STATION, 3, 5, 10),      # 回到 1 号站 (sta=3 -> 圈内站号 1)：完成一圈
+        (ST_CRUISE, 3, 200, 5),
+    ])
+    assert eng.arrivals == {1: 2, 2: 1}
+    assert eng.lap_stat.n == 1 and abs(eng.lap_stat.last - 8.0) < 1e-6
+    assert abs(eng.dwell[1].mean - 1.5) < 1e-6 and abs(eng.dwell[2].last - 1.0) < 1e-6
+    assert eng.seg_aeb_cnt == {(0, 1): 0, (1, 2): 1, (2, 1): 0}
+    assert eng.seg_min_d[(1, 2)] == 15
+    assert abs(eng.travel[(1, 2)].last - 2.0) < 1e-6
+    assert eng.aeb_total == 1
+
+
+def test_counter_wrap_discards_partial_lap():
+    eng = LapAnalytics(2)
+    drive(eng, [(ST_CRUISE, 0, 200, 5), (ST_STATION, 1, 5, 5), (ST_CRUISE, 1, 200, 5),
+                (ST_STATION, 2, 5, 5), (ST_CRUISE, 2, 200, 5),
+                (ST_STATION, 1, 5, 5), (ST_CRUISE, 1, 200, 5)])   # 车辆复位：sta 回到 1
+    assert eng.lap_stat.n == 0
+    assert (2, 1) not in eng.travel
+
+
+def test_finish_closes_open_stop():
+    eng = LapAnalytics(2)
+    end = drive(eng, [(ST_CRUISE, 0, 200, 5), (ST_STATION, 1, 5, 10)])
+    assert 1 not in eng.dwell
+    eng.finish(); eng.finish()
+    assert eng.dwell[1].n == 1 and abs(eng.dwell[1].last - (end - 0.1 - 0.5)) < 1e-6
+
+
+def test_live_index_matches_replay(tmp_path):
+    """ close_session 写出的索引与从 .tlm 重建的索引一致 (含会话结束时仍在停靠) """
+    car = SimCar(speed=80, dwell=3, seed=3)
+    rec = SessionRecorder(str(tmp_path / "run.tlm"))
+    live = LapAnalytics()
+    for t, st, dr, sp, sta, dat in car.run(400, 50):
+        rec.write_frame(t, pack_frame(st, dr, sp, sta, dat))
+        live.feed(t, st, dr, sp, sta, dat)
+        if live.lap_stat.n >= 2 and st == ST_STATION: break
+    rec.close()
+    assert live.cur_station is not None
+    live.finish()
+    live.save_index(rec.path)
+    with open(index_path(rec.path), encoding="utf-8") as f: saved = json.load(f)
+    assert saved == json.loads(json.dumps(LapAnalytics.replay(rec.path).to_index("run.tlm")))
+
+
+def test_counter_wrap_255_to_0_continues():
+    """ 8 位计数器 255 -> 0 回绕不是复位：站号、区间与圈都连续 """
+    eng = LapAnalytics(3)
+    script = [(ST_CRUISE, 0, 200, 2)]
+    for k in range(1, 301):
+        sta = k & 0xFF
+        script += [(ST_STATION, sta, 5, 2), (ST_CRUISE, sta, 200, 3)]
+    drive(eng, script)
+    assert 0 not in eng.arrivals and eng.arrivals == {1: 100, 2: 100, 3: 100}
+    assert eng.lap_stat.n == 99
+    assert set(eng.travel) == {(0, 1), (1, 2), (2, 3), (3, 1)}
+    assert eng.travel[(3, 1)].n == 99
+
+
+def test_counter_drop_to_zero_while_driving_is_reset():
+    eng = LapAnalytics(2)
+    drive(eng, [(ST_CRUISE, 0, 200, 5), (ST_STATION, 1, 5, 5), (ST_CRUISE, 1, 200, 5),
+                (ST_STATION, 2, 5, 5), (ST_CRUISE, 0, 200, 5),   # 复位后计数器归零
+                (ST_STATION, 1, 5, 5), (ST_CRUISE, 1, 200, 5)])
+    assert eng.lap_stat.n == 0
+    assert (2, 1) not in eng.travel and eng.travel[(0, 1)].n == 2
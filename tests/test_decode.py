@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+import telemetry
+from telemetry import FRAME_LEN, decode_bulk, pack_frame
+
+
+def reference(buf):
+    """ 逐字节重同步 (原 loop() 的解析逻辑) """
+    out = []; i = 0
+    while len(buf) - i >= FRAME_LEN:
+        if telemetry.frame_ok(buf, i):
+            out.append(tuple(buf[i+1:i+6])); i += FRAME_LEN
+        else:
+            i += 1
+    return out, buf[i:]
+
+
+def make_stream(n, corrupt, seed=1):
+    rnd = random.Random(seed)
+    data = bytearray()
+    for _ in range(n):
+        data += pack_frame(rnd.randint(0, 3), rnd.randint(0, 4), rnd.randint(0, 1), rnd.randint(0, 20), rnd.randint(0, 250))
+    for k in range(int(n * corrupt)):
+        j = rnd.randrange(len(data))
+        if k % 2: del data[j]                      # 丢字节：后续帧错位
+        else: data[j] = rnd.randrange(256)         # 改写：对齐不变
+    return bytes(data)
+
+
+@pytest.fixture(params=["numpy", "iter_unpack"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        if telemetry.np is None: pytest.skip("numpy 未安装")
+    else:
+        monkeypatch.setattr(telemetry, "np", None)
+    return request.param
+
+
+@pytest.mark.parametrize("corrupt", [0.0, 0.005, 0.05, 0.3])
+def test_matches_reference(backend, corrupt):
+    data = make_stream(5000, corrupt)
+    assert decode_bulk(data) == reference(data)
+
+
+def test_frames_are_tuples(backend):
+    frames, rest = decode_bulk(make_stream(1000, 0.01))
+    assert frames and all(type(f) is tuple and all(type(v) is int for v in f) for f in frames)
+
+
+def test_chunked_equals_whole(backend):
+    data = make_stream(3000, 0.02, seed=7)
+    got = []; buf = b''
+    for k in range(0, len(data), 1000):
+        out, buf = decode_bulk(buf + data[k:k+1000])
+        got += out
+    assert got == decode_bulk(data)[0]
+
+
+def test_keeps_partial_tail(backend):
+    data = pack_frame(1, 0, 1, 2, 30) * 100
+    frames, rest = decode_bulk(data + data[:5])
+    assert len(frames) == 100 and rest == data[:5]
+
+
+def test_resync_after_garbage(backend):
+    good = pack_frame(1, 2, 0, 3, 40)
+    data = good * 300 + b'\x55\x01\x02' + good * 300 + b'\xaa' * 13 + good * 300
+    frames, rest = decode_bulk(data)
+    assert frames == [(1, 2, 0, 3, 40)] * 900 and rest == b''
+
+
+def test_numpy_validates_each_frame_about_once(monkeypatch):
+    """ 损坏后不得对同一段数据反复整块校验 (原实现在 5% 损坏下慢约 10 倍) """
+    if telemetry.np is None: pytest.skip("numpy 未安装")
+    checked = []
+    orig = telemetry._np_block
+    def spy(buf, i, m):
+        checked.append(m); return orig(buf, i, m)
+    monkeypatch.setattr(telemetry, "_np_block", spy)
+    n = 50000
+    for corrupt in (0.005, 0.05):
+        checked.clear()
+        data = make_stream(n, corrupt)
+        decode_bulk(data)
+        assert sum(checked) <= 2 * n
@@ -0,0 +1,41 @@
+import re
+import zipfile
+
+from export_tool import export_session
+from telemetry import ST_AEB, ST_CRUISE, ST_STATION, SessionRecorder, pack_frame
+
+
+def aeb_rows(report):
+    with zipfile.ZipFile(report) as z:
+        xml = z.read("xl/worksheets/sheet5.xml").decode("utf-8")
+    rows = re.findall(r"<row>(.*?)</row>", xml)[1:]
+    return [re.findall(r"<v>(.*?)</v>|<t>(.*?)</t>|<c/>", r) for r in rows]
+
+
+def record(path, script, dt=0.1):
+    rec = SessionRecorder(str(path)); t = 1000.0
+    for st, sta, dat, n in script:
+        for _ in range(n):
+            rec.write_frame(t, pack_frame(st, 0, 1, sta, dat)); t += dt
+    rec.close()
+    return rec.path
+
+
+def test_aeb_rows_carry_full_segment_and_trailing_event(tmp_path):
+    path = record(tmp_path / "s.tlm", [
+        (ST_CRUISE, 0, 200, 5),
+        (ST_STATION, 1, 5, 5),
+        (ST_CRUISE, 1, 200, 5),
+        (ST_AEB, 1, 15, 3),          # 区间 1→2 内
+        (ST_CRUISE, 1, 200, 5),
+        (ST_STATION, 2, 5, 5),
+        (ST_CRUISE, 2, 200, 5),
+        (ST_AEB, 2, 12, 4),          # 会话结束时仍在 AEB
+    ])
+    res = export_session(path, str(tmp_path / "out"), "csv")
+    rows = aeb_rows(res["report"])
+    assert len(rows) == 2
+    labels = [next(t for v, t in r if t) for r in rows]
+    assert labels == ["1→2", "2→--"]
+    durs = [float(r[2][0]) for r in rows]
+    assert abs(durs[0] - 0.3) < 1e-6 and abs(durs[1] - 0.3) < 1e-6
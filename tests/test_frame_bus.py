@@ -0,0 +1,52 @@
+import threading
+
+from frame_bus import LATEST, QUEUED, FrameBus, T_FRAME
+
+
+def test_queued_drops_oldest_and_counts():
+    bus = FrameBus(); got = []
+    sub = bus.subscribe(T_FRAME, lambda *a: got.append(a[0]), QUEUED, maxlen=2)
+    for k in range(3): bus.publish(T_FRAME, k, 0, 0, 0, 0, 0.0)
+    assert sub.drain() == 2 and got == [1, 2]
+    s = sub.stats()
+    assert (s["published"], s["delivered"], s["dropped"], s["depth"]) == (3, 2, 1, 0)
+
+
+def test_latest_keeps_one():
+    bus = FrameBus(); got = []
+    sub = bus.subscribe(T_FRAME, lambda *a: got.append(a[0]), LATEST)
+    for k in range(5): bus.publish(T_FRAME, k, 0, 0, 0, 0, 0.0)
+    sub.drain()
+    assert got == [4]
+
+
+def test_concurrent_push_drain_accounts_for_every_item():
+    """ 读线程向满队列发布、主线程同时取出：每条要么投递要么计入丢弃 """
+    bus = FrameBus(); got = []
+    sub = bus.subscribe(T_FRAME, lambda *a: got.append(a[0]), QUEUED, maxlen=8)
+    n = 50000; done = threading.Event()
+
+    def producer():
+        for k in range(n): bus.publish(T_FRAME, k, 0, 0, 0, 0, 0.0)
+        done.set()
+
+    th = threading.Thread(target=producer); th.start()
+    while not done.is_set(): sub.drain()
+    th.join(); sub.drain()
+    assert sub.delivered + sub.dropped == n == sub.published
+    assert got == sorted(got) and got[-1] == n - 1
+
+
+def test_failing_subscriber_does_not_block_others():
+    errs = []
+    bus = FrameBus(on_error=lambda sub, e: errs.append((sub.name, type(e))))
+    got = []
+    def bad(*a): raise OSError("disk full")
+    bus.subscribe(T_FRAME, bad, name="bad")
+    bus.subscribe(T_FRAME, lambda *a: got.append("sync"))
+    q = bus.subscribe(T_FRAME, lambda *a: got.append("queued"), QUEUED)
+    for _ in range(3): bus.publish(T_FRAME, 0, 0, 0, 0, 0, 0.0)
+    q.drain()
+    assert got == ["sync"] * 3 + ["queued"] * 3
+    assert errs == [("bad", OSError)]          # 只在首次出错时通知
+    assert bus.subs[0].errors == 3
@@ -0,0 +1,27 @@
+from latency_probe import LatencyProbe
+from telemetry import ECHO_SHIFT, PROBE_HEADER
+
+
+def test_no_probe_frames_unless_enabled():
+    p = LatencyProbe()
+    assert all(p.due(k * 0.6) is None for k in range(10))
+    p.set_echo(True)
+    pkt = p.due(10.0)
+    assert pkt[0] == PROBE_HEADER and p.sent == 1
+
+
+def test_echo_sample_and_disable_drops_pending():
+    p = LatencyProbe(echo=True)
+    pkt = p.due(1.0); tag = pkt[1]
+    assert abs(p.on_frame(1.05, 0, (tag << ECHO_SHIFT) | 1) - 0.05) < 1e-9
+    p.due(2.0); p.set_echo(False)
+    p.expire(10.0)
+    assert p.lost == 0 and not p.pending
+
+
+def test_direction_fallback():
+    p = LatencyProbe()
+    p.on_control(1.0, 0, 80, 1)            # 前进 -> Dir 1
+    assert p.on_frame(1.02, 0, 1) is None
+    assert abs(p.on_frame(1.04, 1, 1) - 0.04) < 1e-9
+    assert p.stats()["method"] == "dr"
@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from car_sim import SimCar, SimSerial, line_mismatch
+from link import auto_detect, score_bytes
+from telemetry import pack_frame
+
+
+class MismatchSerial(SimSerial):
+    """ 以 (rx_baud, rx_parity) 打开、车端实际为 (baud, parity) 的仿真串口 """
+    def __init__(self, car, baud, parity, rx_baud, rx_parity):
+        super().__init__(car, rate=50, accel=20)
+        self.line = (baud, parity, rx_baud, rx_parity)
+
+    def read(self, n=1):
+        return line_mismatch(super().read(n), self.car.rnd, *self.line)
+
+
+class NoiseSerial:
+    """ 只有线路噪声、没有设备的串口 """
+    def __init__(self, seed):
+        self.rnd = random.Random(seed)
+
+    @property
+    def in_waiting(self): return 256
+
+    def read(self, n=1): return bytes(self.rnd.randrange(256) for _ in range(n))
+    def reset_input_buffer(self): pass
+    def close(self): pass
+
+
+def opener(baud, parity, opened):
+    def open_port(b, p):
+        opened.append((b, p))
+        return MismatchSerial(SimCar(seed=len(opened)), baud, parity, b, p)
+    return open_port
+
+
+def test_score_bytes():
+    clean = b"".join(pack_frame(1, 1, 1, 0, 100 + k) for k in range(20))
+    assert score_bytes(clean)[1:] == (20, 1.0)
+    assert score_bytes(b"\x00" * 200) == (0.0, 0, 0.0)
+
+
+@pytest.mark.parametrize("baud,parity", [(115200, "N"), (57600, "E"), (19200, "O")])
+def test_auto_detect_picks_device_settings(baud, parity):
+    opened = []
+    res = auto_detect(opener(baud, parity, opened), window=0.05, good_frames=20)
+    assert res[:2] == (baud, parity) and res[4] == 1.0
+    assert opened[-1] == (baud, parity)     # 收满干净帧即提前锁定，不再尝试后续组合
+
+
+def test_auto_detect_without_early_lock_still_picks_best():
+    opened = []
+    res = auto_detect(opener(38400, "N", opened), window=0.05, good_frames=10 ** 6)
+    assert res[:2] == (38400, "N")
+    assert len(opened) == 24
+
+
+def test_auto_detect_rejects_noise_and_open_errors():
+    logs = []
+    def open_port(b, p):
+        if b == 9600: raise OSError("busy")
+        return NoiseSerial(b)
+    assert auto_detect(open_port, window=0.02, log=logs.append) is None
+    assert any("打开失败" in s for s in logs)
@@ -0,0 +1,15 @@
+from param_sweep import DWELL_RANGE, SPEED_RANGE, axis_limits, grid_step, refine_points
+
+
+def test_single_value_axis_is_not_refined():
+    dwells = [3]
+    pts = refine_points({"speed": 60, "dwell": 3}, 5, grid_step(dwells), SPEED_RANGE, axis_limits(dwells, DWELL_RANGE))
+    assert {d for _, d in pts} == {3}
+    assert {s for s, _ in pts} == {55, 60, 65}
+
+
+def test_refinement_stays_inside_user_grid():
+    speeds, dwells = [60, 70, 80], [4, 6, 8]
+    s_lim, d_lim = axis_limits(speeds, SPEED_RANGE), axis_limits(dwells, DWELL_RANGE)
+    pts = refine_points({"speed": 80, "dwell": 4}, 5, 1, s_lim, d_lim)
+    assert {s for s, _ in pts} == {75, 80} and {d for _, d in pts} == {4, 5}
@@ -0,0 +1,26 @@
+import threading
+
+from telemetry import SessionRecorder, iter_events, iter_records, pack_frame
+
+
+def test_concurrent_writers_and_close(tmp_path):
+    """ 读线程写帧/事件、主线程写事件并在中途关闭：不抛异常，事件行不交错，关闭后不再写入 """
+    rec = SessionRecorder(str(tmp_path / "s.tlm"))
+    raw = pack_frame(1, 0, 1, 2, 30)
+    errors = []
+
+    def reader():
+        try:
+            for k in range(20000):
+                rec.write_frame(k * 0.01, raw); rec.write_event(k * 0.01, "state", "1->2")
+        except Exception as e: errors.append(e)
+
+    th = threading.Thread(target=reader); th.start()
+    for k in range(2000): rec.write_event(k * 0.1, "log", "x" * 200)
+    rec.close(); th.join()
+    rec.write_event(0.0, "log", "after close")
+    assert not errors
+    evts = list(iter_events(rec.path))
+    assert all(kind in ("state", "log") for _, kind, _ in evts)
+    assert all(text == "x" * 200 for _, kind, text in evts if kind == "log")
+    assert len(list(iter_records(rec.path))) == rec.frames
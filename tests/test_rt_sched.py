@@ -0,0 +1,15 @@
+from rt_sched import LatenessHist
+
+
+def test_percentile_never_exceeds_max():
+    h = LatenessHist()
+    for us in (8797, 8000, 7000): h.add(us / 1e6)
+    assert h.percentile(50) <= h.max and h.percentile(99) == h.max
+    assert "p50≤8797us" in h.summary()
+
+
+def test_percentile_bucket_upper_bound():
+    h = LatenessHist()
+    for us in [30] * 90 + [150] * 9 + [30000]: h.add(us / 1e6)
+    assert h.percentile(50) == 50 and h.percentile(99) == 200
+    assert abs(h.percentile(100) - 30000) < 1e-6